@@ -0,0 +1,283 @@
+"""
+Benchmarks the internet utils against the local stand-in server at different concurrency levels.
+
+Run it from the root of the repository:
+```sh
+python -m benchmarks.internet
+python -m benchmarks.internet --concurrency 1 16 64 --requests 500 --scenarios raw raw-cached
+```
+
+Every scenario makes `--requests` calls with at most `--concurrency` of them running at once, and reports the
+throughput and the latency percentiles of the calls. By default the stand-in host gets no rate limit or concurrency
+cap from its host policy so the numbers show the connection pool, cache and streaming code, not the rate limiter;
+pass `--host-policies` to keep the configured defaults.
+"""
+
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+from typing import Awaitable, Callable, Optional
+
+from src import config, utils
+
+from .standin import StandInServer
+
+Call = Callable[[int], Awaitable[object]]
+Scenario = Callable[[StandInServer], Call]
+
+# How many distinct pages the scenarios that don't test coalescing or caching spread their requests over
+DISTINCT_PAGES = 50
+
+
+def _raw(server: StandInServer) -> Call:
+    return lambda i: utils.get_raw_content_data(
+        server.url(f"/page/{i % DISTINCT_PAGES}"), cache=False
+    )
+
+
+def _raw_coalesced(server: StandInServer) -> Call:
+    return lambda i: utils.get_raw_content_data(server.url("/page/0"), cache=False)
+
+
+def _raw_cached(server: StandInServer) -> Call:
+    return lambda i: utils.get_raw_content_data(
+        server.url(f"/page/{i % DISTINCT_PAGES}?cache=max-age")
+    )
+
+
+def _raw_revalidated(server: StandInServer) -> Call:
+    return lambda i: utils.get_raw_content_data(
+        server.url(f"/page/{i % DISTINCT_PAGES}?cache=etag")
+    )
+
+
+def _slow(server: StandInServer) -> Call:
+    return lambda i: utils.get_raw_content_data(
+        server.url(f"/slow?delay=0.1&i={i}"), cache=False
+    )
+
+
+async def _oversized(server: StandInServer, i: int) -> None:
+    try:
+        await utils.get_raw_content_data(
+            server.url(f"/large?size={64 * 1024**2}&length=0&i={i}"),
+            cache=False,
+            max_size=config.HTTP_MAX_DOWNLOAD_SIZE,
+        )
+    except utils.ContentTooLargeError:
+        return
+    raise AssertionError("oversized body was not rejected")
+
+
+def _read_website(server: StandInServer) -> Call:
+    return lambda i: utils.read_website(
+        server.url(f"/page/{i % DISTINCT_PAGES}"), cache=False, main_content=True
+    )
+
+
+def _search_web(server: StandInServer) -> Call:
+    return lambda i: utils.search_web(
+        f"query {i}", 3, searxng_url=server.url("/search")
+    )
+
+
+def _fetch_image(server: StandInServer) -> Call:
+    return lambda i: utils.fetch_image(
+        server.url(f"/image/{256 + i % DISTINCT_PAGES}x256.png"), cache=False
+    )
+
+
+SCENARIOS: dict[str, Scenario] = {
+    "raw": _raw,
+    "raw-coalesced": _raw_coalesced,
+    "raw-cached": _raw_cached,
+    "raw-revalidated": _raw_revalidated,
+    "slow": _slow,
+    "oversized": lambda server: lambda i: _oversized(server, i),
+    "read_website": _read_website,
+    "search_web": _search_web,
+    "fetch_image": _fetch_image,
+}
+
+
+class Result:
+    def __init__(
+        self,
+        scenario: str,
+        concurrency: int,
+        latencies: list[float],
+        errors: int,
+        elapsed: float,
+        server_hits: int,
+    ) -> None:
+        self.scenario = scenario
+        self.concurrency = concurrency
+        self.latencies = sorted(latencies)
+        self.errors = errors
+        self.elapsed = elapsed
+        self.server_hits = server_hits
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return float("nan")
+        index = min(len(self.latencies) - 1, int(len(self.latencies) * p / 100))
+        return self.latencies[index]
+
+    @property
+    def throughput(self) -> float:
+        return len(self.latencies) / self.elapsed if self.elapsed else float("inf")
+
+    def row(self) -> tuple[str, ...]:
+        return (
+            self.scenario,
+            str(self.concurrency),
+            str(len(self.latencies)),
+            str(self.errors),
+            str(self.server_hits),
+            f"{self.throughput:.1f}",
+            f"{statistics.fmean(self.latencies) * 1000:.2f}" if self.latencies else "-",
+            f"{self.percentile(50) * 1000:.2f}",
+            f"{self.percentile(95) * 1000:.2f}",
+            f"{self.percentile(99) * 1000:.2f}",
+        )
+
+
+HEADER = ("scenario", "conc", "calls", "errors", "hits", "calls/s", "mean ms", "p50 ms", "p95 ms", "p99 ms")  # fmt: skip
+
+
+async def run_scenario(
+    server: StandInServer, name: str, concurrency: int, requests: int
+) -> Result:
+    """Make `requests` calls of a scenario with at most `concurrency` running at once."""
+    call = SCENARIOS[name](server)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    errors = 0
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await call(i)
+            except Exception:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    hits_before = sum(server.hits.values())
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    return Result(
+        name,
+        concurrency,
+        latencies,
+        errors,
+        elapsed,
+        sum(server.hits.values()) - hits_before,
+    )
+
+
+def _print_table(rows: list[tuple[str, ...]]) -> None:
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    for row in rows:
+        print(
+            "  ".join(
+                cell.ljust(width) if i == 0 else cell.rjust(width)
+                for i, (cell, width) in enumerate(zip(row, widths))
+            ),
+            flush=True,
+        )
+
+
+async def main(
+    scenarios: list[str],
+    concurrency_levels: list[int],
+    requests: int,
+    *,
+    host_policies: bool = False,
+) -> list[Result]:
+    results: list[Result] = []
+
+    async with StandInServer() as server:
+        if not host_policies:
+            config.HTTP_HOST_POLICIES[server.host] = {
+                "rate": float("inf"),
+                "burst": float("inf"),
+                "concurrency": 1_000_000,
+            }
+
+        with tempfile.TemporaryDirectory() as folder:
+            session = utils.create_session()
+            utils.set_default_session(session)
+            utils.set_default_cache(utils.HTTPCache(folder=folder))
+
+            try:
+                # Warm up the worker processes and the stand-in's generated pages and images
+                for name in scenarios:
+                    await run_scenario(server, name, 4, 4)
+
+                rows = [HEADER]
+                for name in scenarios:
+                    for concurrency in concurrency_levels:
+                        result = await run_scenario(server, name, concurrency, requests)
+                        results.append(result)
+                        rows.append(result.row())
+                _print_table(rows)
+
+            finally:
+                utils.set_default_cache(None)
+                utils.set_default_session(None)
+                await session.close()
+                utils.shutdown_html_workers()
+
+    return results
+
+
+def parse_args(args: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.internet",
+        description="Benchmark the internet utils against a local stand-in server.",
+    )
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        choices=list(SCENARIOS),
+        default=list(SCENARIOS),
+        help="the scenarios to run (default: all)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        nargs="+",
+        type=int,
+        default=[1, 8, 32],
+        help="the concurrency levels to run every scenario at (default: 1 8 32)",
+    )
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=200,
+        help="the amount of calls per scenario and concurrency level (default: 200)",
+    )
+    parser.add_argument(
+        "--host-policies",
+        action="store_true",
+        help="keep the configured rate limit and concurrency cap for the stand-in host",
+    )
+    return parser.parse_args(args)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    asyncio.run(
+        main(
+            arguments.scenarios,
+            arguments.concurrency,
+            arguments.requests,
+            host_policies=arguments.host_policies,
+        )
+    )
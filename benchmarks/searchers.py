@@ -0,0 +1,152 @@
+"""
+Benchmarks the `match*` functions over synthetic corpora of different sizes.
+
+Run it from the root of the repository:
+```sh
+python -m benchmarks.searchers
+python -m benchmarks.searchers --sizes 5000 100000 --repeat 10
+```
+
+Every scenario scans the whole corpus once per run and reports the best of `--repeat` runs. `reference` is the plain
+lowercase-and-split matcher the `match*` functions used before they folded accents, as the baseline to compare the
+others against. `warm` scans the same corpus twice in a row, which is where caching corpus strings would show up.
+"""
+
+import time
+import random
+import string
+import argparse
+from typing import Callable, Optional
+
+from src import utils
+
+Scenario = Callable[[list[str]], Callable[[], object]]
+
+QUERY = "ab cd"
+
+
+class Item:
+    __slots__ = ("name",)
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+
+def _reference_match(query: str, text: str) -> bool:
+    if query.lower() in text.lower():
+        return True
+    text_fragments = text.lower().split()
+    return all(
+        any(fragment in text_fragment for text_fragment in text_fragments)
+        for fragment in query.lower().split()
+    )
+
+
+def _reference(corpus: list[str]) -> Callable[[], object]:
+    return lambda: [_reference_match(QUERY, text) for text in corpus]
+
+
+def _match(corpus: list[str]) -> Callable[[], object]:
+    return lambda: [utils.match(QUERY, text) for text in corpus]
+
+
+def _match_accented(corpus: list[str]) -> Callable[[], object]:
+    accented = [text + " crème" for text in corpus]
+    return lambda: [utils.match(QUERY, text) for text in accented]
+
+
+def _match_normalized(corpus: list[str]) -> Callable[[], object]:
+    normalized = [utils.normalize(text, cache=False) for text in corpus]
+    return lambda: [utils.match(QUERY, text) for text in normalized]
+
+
+def _by_attr(corpus: list[str]) -> Callable[[], object]:
+    items = [Item(text) for text in corpus]
+    return lambda: utils.get_matches_by_attr(QUERY, items, key=lambda item: item.name)
+
+
+def _warm(corpus: list[str]) -> Callable[[], object]:
+    return lambda: [utils.match(QUERY, text) for text in corpus * 2]
+
+
+SCENARIOS: dict[str, Scenario] = {
+    "reference": _reference,
+    "match": _match,
+    "match-accented": _match_accented,
+    "match-normalized": _match_normalized,
+    "get_matches_by_attr": _by_attr,
+    "warm": _warm,
+}
+
+
+def make_corpus(size: int, *, seed: int = 0) -> list[str]:
+    """Make `size` strings of two random ASCII words each."""
+    rng = random.Random(seed)
+
+    def word() -> str:
+        return "".join(
+            rng.choice(string.ascii_letters) for _ in range(rng.randint(3, 9))
+        )
+
+    return [f"{word()} {word()}" for _ in range(size)]
+
+
+def run_scenario(name: str, corpus: list[str], repeat: int) -> float:
+    """Return the best time of `repeat` runs of a scenario, in seconds."""
+    run = SCENARIOS[name](corpus)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(scenarios: list[str], sizes: list[int], repeat: int) -> dict[str, list[float]]:
+    results: dict[str, list[float]] = {}
+    corpora = [make_corpus(size) for size in sizes]
+
+    width = max(len(name) for name in scenarios)
+    print(f"{'scenario':<{width}}  " + "  ".join(f"{size:>9,}" for size in sizes))
+    for name in scenarios:
+        results[name] = [run_scenario(name, corpus, repeat) for corpus in corpora]
+        print(
+            f"{name:<{width}}  "
+            + "  ".join(f"{seconds * 1000:>7.1f}ms" for seconds in results[name]),
+            flush=True,
+        )
+
+    return results
+
+
+def parse_args(args: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.searchers",
+        description="Benchmark the match* functions over synthetic corpora.",
+    )
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        choices=list(SCENARIOS),
+        default=list(SCENARIOS),
+        help="the scenarios to run (default: all)",
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=int,
+        default=[5_000, 20_000, 100_000],
+        help="the corpus sizes to run every scenario on (default: 5000 20000 100000)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="the amount of runs per scenario and size, the best one is reported (default: 5)",
+    )
+    return parser.parse_args(args)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    main(arguments.scenarios, arguments.sizes, arguments.repeat)
@@ -0,0 +1,209 @@
+"""
+A local stand-in for SearXNG and the websites the internet utils talk to, so they can be exercised and benchmarked
+without the internet.
+
+Use it as an async context manager:
+```py
+async with StandInServer() as server:
+    await utils.search_web("cats", 3, searxng_url=server.url("/search"))
+```
+
+or run it on its own with `python -m benchmarks.standin [port]`.
+
+Routes:
+- `/search?q=...&format=json&pageno=N` - SearXNG JSON results, 10 per page.
+- `/page/{n}` - an HTML page. `?cache=etag` adds an ETag, `?cache=max-age` a one hour max-age.
+- `/image/{width}x{height}.{png,jpg,gif,webp}` - a generated gradient image.
+- `/slow?delay=1.5` - responds after `delay` seconds.
+- `/large?size=N` - an N byte body, sent in chunks. `&length=0` leaves out `Content-Length`.
+- `/status/{code}` - an empty response with the given status code.
+"""
+
+import io
+import sys
+import asyncio
+import hashlib
+from typing import Any, Optional
+from collections import Counter
+
+from aiohttp import web
+from PIL import Image
+
+__all__ = ("StandInServer",)
+
+PAGE_PARAGRAPHS = 200
+IMAGE_FORMATS = {"png": "PNG", "jpg": "JPEG", "gif": "GIF", "webp": "WEBP"}
+
+
+def _page(n: int) -> bytes:
+    paragraphs = "".join(
+        f"<p>Paragraph {i} of page {n} with <a href='/page/{n + 1}'>a link</a> and <b>some bold text</b>.</p>"
+        for i in range(PAGE_PARAGRAPHS)
+    )
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+        f"<title>Page {n}</title><style>p {{ color: red; }}</style><script>var page = {n};</script></head>"
+        f"<body><nav><a href='/'>Home</a></nav><main><h1>Page {n}</h1>{paragraphs}</main>"
+        "<footer>Stand-in footer</footer></body></html>"
+    ).encode()
+
+
+def _image(width: int, height: int, format: str) -> bytes:
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, IMAGE_FORMATS[format])
+    return buffer.getvalue()
+
+
+class StandInServer:
+    """A local aiohttp server with canned SearXNG, HTML, image, slow and oversized responses."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.host = host
+        self.port = port
+        self.hits: Counter[str] = Counter()
+
+        self._runner: Optional[web.AppRunner] = None
+        self._pages: dict[int, bytes] = {}
+        self._images: dict[tuple[int, int, str], bytes] = {}
+
+        self.app = web.Application()
+        self.app.router.add_get("/search", self.search)
+        self.app.router.add_get("/page/{n:\\d+}", self.page)
+        self.app.router.add_get(
+            "/image/{width:\\d+}x{height:\\d+}.{format:png|jpg|gif|webp}", self.image
+        )
+        self.app.router.add_get("/slow", self.slow)
+        self.app.router.add_get("/large", self.large)
+        self.app.router.add_get("/status/{code:\\d+}", self.status)
+
+    async def __aenter__(self) -> "StandInServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.stop()
+
+    def url(self, path: str = "/") -> str:
+        return f"http://{self.host}:{self.port}{path}"
+
+    async def start(self) -> None:
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+
+        # Find out which port we got if we asked for any free one
+        server = site._server
+        if self.port == 0 and server is not None:
+            self.port = server.sockets[0].getsockname()[1]  # type: ignore
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def search(self, request: web.Request) -> web.Response:
+        self.hits["search"] += 1
+        query = request.query.get("q", "")
+        pageno = int(request.query.get("pageno", "1"))
+
+        results = []
+        for i in range(10):
+            rank = (pageno - 1) * 10 + i
+            results.append(
+                {
+                    "url": self.url(f"/page/{rank}"),
+                    "title": f"{query} result {rank}",
+                    "content": f"Result {rank} for {query}",
+                    "publishedDate": None,
+                    "engines": ["standin"],
+                    "score": 100 / (rank + 1),
+                }
+            )
+
+        return web.json_response({"query": query, "results": results})
+
+    async def page(self, request: web.Request) -> web.Response:
+        self.hits["page"] += 1
+        n = int(request.match_info["n"])
+        body = self._pages.get(n)
+        if body is None:
+            body = self._pages[n] = _page(n)
+
+        headers = {"Content-Type": "text/html; charset=utf-8"}
+        cache = request.query.get("cache")
+        if cache == "etag":
+            etag = '"' + hashlib.md5(body).hexdigest() + '"'
+            headers["ETag"] = etag
+            headers["Cache-Control"] = "no-cache"
+            if request.headers.get("If-None-Match") == etag:
+                return web.Response(status=304, headers=headers)
+        elif cache == "max-age":
+            headers["Cache-Control"] = "max-age=3600"
+
+        return web.Response(body=body, headers=headers)
+
+    async def image(self, request: web.Request) -> web.Response:
+        self.hits["image"] += 1
+        key = (
+            int(request.match_info["width"]),
+            int(request.match_info["height"]),
+            request.match_info["format"],
+        )
+        body = self._images.get(key)
+        if body is None:
+            body = self._images[key] = await asyncio.to_thread(_image, *key)
+
+        content_type = "image/jpeg" if key[2] == "jpg" else f"image/{key[2]}"
+        return web.Response(
+            body=body,
+            headers={"Content-Type": content_type, "Cache-Control": "max-age=3600"},
+        )
+
+    async def slow(self, request: web.Request) -> web.Response:
+        self.hits["slow"] += 1
+        await asyncio.sleep(float(request.query.get("delay", "1")))
+        return web.Response(text="finally")
+
+    async def large(self, request: web.Request) -> web.StreamResponse:
+        self.hits["large"] += 1
+        size = int(request.query.get("size", str(100 * 1024**2)))
+
+        response = web.StreamResponse()
+        if request.query.get("length", "1") == "0":
+            response.enable_chunked_encoding()
+        else:
+            response.content_length = size
+        await response.prepare(request)
+
+        chunk = b"\0" * 65536
+        sent = 0
+        try:
+            while sent < size:
+                part = chunk[: size - sent]
+                await response.write(part)
+                sent += len(part)
+        except ConnectionError:
+            # The client gave up on the body, which is the point of this route
+            return response
+
+        await response.write_eof()
+        return response
+
+    async def status(self, request: web.Request) -> web.Response:
+        self.hits["status"] += 1
+        return web.Response(status=int(request.match_info["code"]))
+
+
+async def _serve(port: int) -> None:
+    async with StandInServer(port=port) as server:
+        print(f"stand-in server running on {server.url()}", flush=True)
+        await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(_serve(int(sys.argv[1]) if len(sys.argv) > 1 else 8080))
+    except KeyboardInterrupt:
+        pass
@@ -38,10 +38,15 @@ from .config import (
     DEBUG,
     LOGS_FOLDER,
     LOG_FILENAME_TIME_FORMAT,
+    LOG_CONSOLE_FORMAT,
+    LOG_FILE_FORMAT,
 )
 from .utils import (
     get_logger,
     setup_logging,
+    get_log_formatter,
+    add_log_handler,
+    queue_log_handlers,
     get_prefix,
     print_terminal_size,
     print_versions,
@@ -49,10 +54,19 @@ from .utils import (
 from .classes import Bot
 from .termcolors import *
 
+console_formatter = get_log_formatter(LOG_CONSOLE_FORMAT)
+
 logger = get_logger(__name__)
 if not logger.hasHandlers():
-    setup_logging(name=BOT_NAME, level=logging.DEBUG if DEBUG else None)
-discord.utils.setup_logging(root=False)
+    setup_logging(
+        name=BOT_NAME,
+        level=logging.DEBUG if DEBUG else None,
+        formatter=console_formatter,
+    )
+discord.utils.setup_logging(
+    formatter=console_formatter or discord.utils.MISSING, root=False
+)
+queue_log_handlers(logging.getLogger("discord"))
 
 logger.info("initialising bot")
 
@@ -67,7 +81,7 @@ if LOGS_FOLDER:
         f"{BOT_NAME} {datetime.now().strftime(LOG_FILENAME_TIME_FORMAT)}.log",
     )
 
-    log_file_formatter = logging.Formatter(
+    log_file_formatter = get_log_formatter(LOG_FILE_FORMAT) or logging.Formatter(
         "{asctime} {levelname:<8} {name} > {message}", "%Y-%m-%d %H:%M:%S", style="{"
     )
 
@@ -75,10 +89,10 @@ if LOGS_FOLDER:
     log_file_handler.setFormatter(log_file_formatter)
     log_file_handler.setLevel(logging.DEBUG)
 
-    logger.addHandler(log_file_handler)
+    add_log_handler(logger, log_file_handler)
     logger.debug(f"{BOT_NAME} file handler set up")
 
-    logging.getLogger("discord").addHandler(log_file_handler)
+    add_log_handler(logging.getLogger("discord"), log_file_handler)
     logger.debug("discord.py file handler set up")
 
 print_versions()
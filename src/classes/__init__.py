@@ -2,4 +2,5 @@ from .bot import *
 from .cog import *
 from .context import *
 from .command_tree import *
+from .guild_search import *
 from .custom_types import *
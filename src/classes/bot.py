@@ -13,6 +13,7 @@ from ..termcolors import *
 
 from .context import Context
 from .command_tree import CommandTree
+from .guild_search import GuildSearchIndexes
 
 if TYPE_CHECKING:
     from .custom_types import ContextT_co, PrefixType
@@ -36,6 +37,11 @@ class Bot(commands.Bot):
     log_channel: Optional[discord.TextChannel]
     log_channel_id: Optional[int]
     all_app_commands: dict[str, app_commands.AppCommand]
+    search_indexes: GuildSearchIndexes
+    session: aiohttp.ClientSession
+    http_cache: utils.HTTPCache
+    http_tracer: utils.HTTPTracer
+    images: utils.ImageService
 
     def __init__(
         self,
@@ -59,6 +65,14 @@ class Bot(commands.Bot):
         self.log_channel_id = LOG_CHANNEL
         self.log_channel = None
 
+        self.search_indexes = GuildSearchIndexes(self)
+
+        self.http_cache = utils.HTTPCache()
+        utils.set_default_cache(self.http_cache)
+        self.http_tracer = utils.HTTPTracer()
+
+        self.images = utils.ImageService(color_cache=utils.ColorCache())
+
     async def connect_db(self) -> None:
         if self.prisma.is_connected():
             logger.warning("tried to connect to database while already connected")
@@ -183,6 +197,11 @@ class Bot(commands.Bot):
     async def setup_hook(self) -> None:
         self.uptime = discord.utils.utcnow()
 
+        self.session = utils.create_session(
+            trace_configs=[self.http_tracer.trace_config]
+        )
+        utils.set_default_session(self.session)
+
         assert self.user is not None
 
         mprint()
@@ -197,6 +216,8 @@ class Bot(commands.Bot):
         await self.connect_db()
         await self._load_all_cogs()
 
+        self.search_indexes.start()
+
         await self.tree.update_app_commands()
         logger.info(f"app commands loaded: {len(self.tree.all_app_commands)}")
 
@@ -211,14 +232,14 @@ class Bot(commands.Bot):
         if self.log_channel is not None:
             location = "N/A"
             try:
-                async with aiohttp.ClientSession(
+                async with self.session.get(
+                    "https://ipinfo.io/",
                     skip_auto_headers=["Accept", "User-Agent"],
                     headers={"Accept": "*/*", "User-Agent": "curl/8.12.1"},
-                ) as session:
-                    async with session.get("https://ipinfo.io/") as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            location = f"{data.get('city', 'Unknown City')}, {data.get('region', 'Unknown Region')}, {data.get('country', 'Unknown Country')}"
+                ) as response:
+                    if response.status == 200:
+                        data = await response.json()
+                        location = f"{data.get('city', 'Unknown City')}, {data.get('region', 'Unknown Region')}, {data.get('country', 'Unknown Country')}"
 
             except Exception as e:
                 logger.error(
@@ -256,13 +277,28 @@ class Bot(commands.Bot):
                 )
 
     async def close(self, *, abandon: bool = False) -> None:
-        """Disconnect from the database, close the bot, flush stdout & stderr and shutdown loggers"""
+        """Disconnect from the database, close the bot and HTTP session, flush stdout & stderr and shutdown loggers"""
         # Disconnect from the database
         await self.disconnect_db()
 
+        # Drop the search indexes
+        self.search_indexes.stop()
+
         # Close the bot
         await super().close()
 
+        # Close the HTTP session
+        if hasattr(self, "session") and not self.session.closed:
+            await self.session.close()
+            if utils.get_default_session() is self.session:
+                utils.set_default_session(None)
+
+        # Stop the HTML conversion and image workers
+        utils.shutdown_html_workers()
+        await self.images.close()
+        if self.images.color_cache is not None:
+            self.images.color_cache.close()
+
         # Flush stdout & stderr
         sys.stdout.flush()
         sys.stderr.flush()
@@ -271,6 +307,7 @@ class Bot(commands.Bot):
         logger.critical(
             "bot process exited" if not abandon else "bot process exited (abandoned)"
         )
+        utils.stop_log_queues()
         logging.shutdown()
 
         if abandon:
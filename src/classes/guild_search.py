@@ -0,0 +1,240 @@
+import time
+import asyncio
+from typing import TYPE_CHECKING, Optional
+
+from ..config import SEARCH_INDEX_IDLE_TIMEOUT
+from ..utils import get_logger, SearchIndex
+
+if TYPE_CHECKING:
+    from .bot import Bot
+
+import discord
+from discord.ext import tasks
+
+__all__ = (
+    "GuildSearchIndex",
+    "GuildSearchIndexes",
+)
+
+logger = get_logger(__name__)
+
+# How many members to index before yielding back to the event loop while building
+BUILD_BATCH_SIZE = 5000
+
+
+def _member_text(member: discord.Member | discord.User) -> str:
+    names = [member.display_name, member.global_name or "", member.name]
+    return " ".join(dict.fromkeys(name for name in names if name))
+
+
+class GuildSearchIndex:
+    """Search indexes over the members and roles of a single guild."""
+
+    guild_id: int
+    members: SearchIndex[int]
+    roles: SearchIndex[int]
+    last_used: float
+
+    def __init__(self, guild_id: int) -> None:
+        self.guild_id = guild_id
+        self.members = SearchIndex()
+        self.roles = SearchIndex()
+        self.last_used = time.monotonic()
+
+    def add_member(self, member: discord.Member | discord.User) -> None:
+        self.members.add(member.id, _member_text(member))
+
+    def remove_member(self, member_id: int) -> None:
+        self.members.remove(member_id)
+
+    def add_role(self, role: discord.Role) -> None:
+        self.roles.add(role.id, role.name)
+
+    def remove_role(self, role_id: int) -> None:
+        self.roles.remove(role_id)
+
+    async def build(self, guild: discord.Guild) -> None:
+        """Index every cached member and role of the guild, yielding to the event loop between batches."""
+        for role in guild.roles:
+            self.add_role(role)
+
+        for i, member in enumerate(list(guild.members), start=1):
+            # The member may have left while we were yielding
+            current = guild.get_member(member.id)
+            if current is not None:
+                self.add_member(current)
+
+            if i % BUILD_BATCH_SIZE == 0:
+                await asyncio.sleep(0)
+
+
+class GuildSearchIndexes:
+    """
+    Lazily built per-guild member and role search indexes.
+
+    An index is built the first time a guild is searched, kept up to date from gateway events and evicted once the
+    guild hasn't been searched for `SEARCH_INDEX_IDLE_TIMEOUT` seconds.
+    """
+
+    bot: "Bot"
+    idle_timeout: float
+
+    def __init__(
+        self, bot: "Bot", *, idle_timeout: float = SEARCH_INDEX_IDLE_TIMEOUT
+    ) -> None:
+        self.bot = bot
+        self.idle_timeout = idle_timeout
+        self._indexes: dict[int, GuildSearchIndex] = {}
+        self._building: dict[int, asyncio.Task[GuildSearchIndex]] = {}
+
+        bot.add_listener(self._on_member_join, "on_member_join")
+        bot.add_listener(self._on_member_update, "on_member_update")
+        bot.add_listener(self._on_user_update, "on_user_update")
+        bot.add_listener(self._on_raw_member_remove, "on_raw_member_remove")
+        bot.add_listener(self._on_guild_role_create, "on_guild_role_create")
+        bot.add_listener(self._on_guild_role_update, "on_guild_role_update")
+        bot.add_listener(self._on_guild_role_delete, "on_guild_role_delete")
+        bot.add_listener(self._on_guild_remove, "on_guild_remove")
+
+    def __len__(self) -> int:
+        return len(self._indexes)
+
+    def start(self) -> None:
+        """Start evicting idle indexes in the background."""
+        if not self.evict_loop.is_running():
+            self.evict_loop.start()
+
+    def stop(self) -> None:
+        """Stop the eviction loop and drop every index."""
+        self.evict_loop.cancel()
+        for task in self._building.values():
+            task.cancel()
+        self._building.clear()
+        self._indexes.clear()
+
+    async def get(self, guild: discord.Guild) -> GuildSearchIndex:
+        """Get the index for a guild, building it first if needed."""
+        task = self._building.get(guild.id)
+        index = self._indexes.get(guild.id) if task is None else None
+
+        if index is None:
+            if task is None:
+                task = asyncio.create_task(self._build(guild))
+                self._building[guild.id] = task
+            index = await asyncio.shield(task)
+
+        index.last_used = time.monotonic()
+        return index
+
+    async def _build(self, guild: discord.Guild) -> GuildSearchIndex:
+        start = time.perf_counter()
+        index = GuildSearchIndex(guild.id)
+
+        # Register the index before building so that events received mid-build are applied to it
+        self._indexes[guild.id] = index
+        try:
+            await index.build(guild)
+        except BaseException:
+            self._indexes.pop(guild.id, None)
+            raise
+        finally:
+            self._building.pop(guild.id, None)
+
+        logger.debug(
+            f"built search index for guild {guild.id} ({len(index.members)} members, {len(index.roles)} roles) "
+            f"in {(time.perf_counter() - start) * 1000:.2f}ms"
+        )
+        return index
+
+    async def search_members(
+        self, guild: discord.Guild, query: str, *, limit: Optional[int] = 25
+    ) -> list[discord.Member]:
+        """Search the members of a guild by display name, global name and username."""
+        index = await self.get(guild)
+        members = (
+            guild.get_member(member_id)
+            for member_id in index.members.search(query, limit=limit)
+        )
+        return [member for member in members if member is not None]
+
+    async def search_roles(
+        self, guild: discord.Guild, query: str, *, limit: Optional[int] = 25
+    ) -> list[discord.Role]:
+        """Search the roles of a guild by name."""
+        index = await self.get(guild)
+        roles = (
+            guild.get_role(role_id)
+            for role_id in index.roles.search(query, limit=limit)
+        )
+        return [role for role in roles if role is not None]
+
+    def evict(self, guild_id: int) -> None:
+        """Drop the index of a guild. It will be rebuilt the next time it is searched."""
+        task = self._building.pop(guild_id, None)
+        if task is not None:
+            task.cancel()
+        self._indexes.pop(guild_id, None)
+
+    @tasks.loop(minutes=5)
+    async def evict_loop(self) -> None:
+        now = time.monotonic()
+        idle = [
+            guild_id
+            for guild_id, index in self._indexes.items()
+            if guild_id not in self._building
+            and now - index.last_used > self.idle_timeout
+        ]
+        for guild_id in idle:
+            self.evict(guild_id)
+
+        if idle:
+            logger.debug(f"evicted {len(idle)} idle guild search indexes")
+
+    async def _on_member_join(self, member: discord.Member) -> None:
+        index = self._indexes.get(member.guild.id)
+        if index is not None:
+            index.add_member(member)
+
+    async def _on_member_update(
+        self, before: discord.Member, after: discord.Member
+    ) -> None:
+        index = self._indexes.get(after.guild.id)
+        if index is not None and _member_text(before) != _member_text(after):
+            index.add_member(after)
+
+    async def _on_user_update(self, before: discord.User, after: discord.User) -> None:
+        if _member_text(before) == _member_text(after):
+            return
+
+        for guild in after.mutual_guilds:
+            index = self._indexes.get(guild.id)
+            member = guild.get_member(after.id)
+            if index is not None and member is not None:
+                index.add_member(member)
+
+    async def _on_raw_member_remove(
+        self, payload: discord.RawMemberRemoveEvent
+    ) -> None:
+        index = self._indexes.get(payload.guild_id)
+        if index is not None:
+            index.remove_member(payload.user.id)
+
+    async def _on_guild_role_create(self, role: discord.Role) -> None:
+        index = self._indexes.get(role.guild.id)
+        if index is not None:
+            index.add_role(role)
+
+    async def _on_guild_role_update(
+        self, before: discord.Role, after: discord.Role
+    ) -> None:
+        index = self._indexes.get(after.guild.id)
+        if index is not None and before.name != after.name:
+            index.add_role(after)
+
+    async def _on_guild_role_delete(self, role: discord.Role) -> None:
+        index = self._indexes.get(role.guild.id)
+        if index is not None:
+            index.remove_role(role.id)
+
+    async def _on_guild_remove(self, guild: discord.Guild) -> None:
+        self.evict(guild.id)
@@ -24,6 +24,24 @@ from discord.ext import commands
 
 logger = get_logger(__name__)
 
+# The most characters of table rows to send, leaving room for the code block and the footer in a message
+TABLE_MAX_LENGTH = 1900
+
+
+def fit_lines(lines: list[str], max_length: int = TABLE_MAX_LENGTH) -> list[str]:
+    """Return the first lines that fit in `max_length` characters when joined with newlines"""
+    length = -1
+    for index, line in enumerate(lines):
+        length += len(line) + 1
+        if length > max_length:
+            return lines[:index]
+    return lines
+
+
+def ms(seconds: Optional[float], *, digits: int = 0, unit: str = "ms") -> str:
+    """Format seconds as milliseconds, or "-" if there is no value"""
+    return "-" if seconds is None else f"{seconds * 1000:.{digits}f}{unit}"
+
 
 class Developer(Cog):
     def __init__(self, bot: Bot) -> None:
@@ -212,6 +230,103 @@ class Developer(Cog):
             f"**[Click to invite me to a server](https://discord.com/oauth2/authorize?client_id={self.bot.application_id}&permissions=8&scope=bot+applications.commands)**"
         )
 
+    @commands.command(name="http-hosts", aliases=["hosts", "breakers"])
+    async def http_hosts(self, ctx: Context, host: Optional[str] = None) -> None:
+        """Show the circuit breaker state and latency of the hosts HTTP requests were made to"""
+        policies = utils.get_host_policies()
+        if host is not None:
+            policies = [policy for policy in policies if host.lower() in policy.host]
+
+        if not policies:
+            await ctx.send("No HTTP requests have been made to any matching host yet.")
+            return
+
+        lines = []
+        for policy in policies:
+            state = policy.breaker.state
+            if state == "open":
+                state += f" ({policy.breaker.retry_after:.0f}s)"
+            lines.append(
+                f"{utils.trim_and_add_suffix(policy.host, 32):<32} {state:<14} "
+                f"req {policy.requests:<6} err {policy.errors:<5} in-flight {policy.in_flight:<3} "
+                f"avg {ms(policy.average_latency):<7} last {ms(policy.last_latency)}"
+            )
+
+        shown = fit_lines(lines)
+        more = (
+            f"\n-# and {len(lines) - len(shown)} more"
+            if len(shown) < len(lines)
+            else ""
+        )
+        await ctx.send(utils.code("\n".join(shown), "prolog") + more)
+
+    @commands.command(name="http-timings", aliases=["timings"])
+    async def http_timings(self, ctx: Context, host: Optional[str] = None) -> None:
+        """Show where the time of HTTP requests goes (p50/p95 per phase) and how often pooled connections are reused"""
+        tracer = self.bot.http_tracer
+        hosts = [tracer.overall, *tracer.hosts()]
+        if host is not None:
+            hosts = [timings for timings in hosts if host.lower() in timings.host]
+
+        if not tracer.overall.requests or not hosts:
+            await ctx.send("No HTTP requests have been made to any matching host yet.")
+            return
+
+        lines = []
+        for timings in hosts:
+            reuse = timings.reuse_rate
+            phases = " ".join(
+                f"{phase} {ms(timings[phase].percentile(50), unit='')}/{ms(timings[phase].percentile(95), unit='')}"
+                for phase in ("dns", "connect", "ttfb", "total")
+            )
+            lines.append(
+                f"{utils.trim_and_add_suffix(timings.host, 28):<28} req {timings.requests:<6} "
+                f"err {timings.errors:<4} reuse {'-' if reuse is None else f'{reuse:.0%}':<5} {phases}"
+            )
+
+        shown = fit_lines(lines)
+        more = (
+            f", and {len(lines) - len(shown)} more hosts"
+            if len(shown) < len(lines)
+            else ""
+        )
+        await ctx.send(
+            utils.code("\n".join(shown), "prolog")
+            + "\n-# p50/p95 in ms, connect includes TLS"
+            + more
+        )
+
+    @commands.command(name="image-service", aliases=["images"])
+    async def image_service(self, ctx: Context) -> None:
+        """Show the queue depth and job timings (p50/p95) of the image processing workers"""
+        images = self.bot.images
+
+        lines = [
+            f"workers {images.workers} ({'running' if images.running else 'stopped'})  "
+            f"queued {images.queue_depth}/{images.queue_size}  in-flight {images.in_flight}  "
+            f"done {images.completed}  failed {images.failed}"
+        ]
+        for phase, histogram in images.timings.items():
+            lines.append(
+                f"{phase:<9} p50 {ms(histogram.percentile(50), digits=1):<9} "
+                f"p95 {ms(histogram.percentile(95), digits=1):<9} "
+                f"max {ms(histogram.max if histogram.count else None, digits=1)}"
+            )
+
+        budget = utils.get_decode_budget()
+        lines.append(
+            f"decode budget: {budget.in_use / 1024**2:.0f}/{budget.limit / 1024**2:.0f} MiB in use  "
+            f"waiting {budget.waiting}"
+        )
+
+        cache = images.color_cache
+        if cache is not None:
+            lines.append(
+                f"color cache: {len(cache)} in memory  hits {cache.hits}  misses {cache.misses}"
+            )
+
+        await ctx.send(utils.code("\n".join(lines), "prolog"))
+
     @commands.command()
     async def sudo(
         self,
@@ -106,7 +106,12 @@ class Events(Cog):
         elif isinstance(exception, commands.CommandNotFound):
             if config.LOG_NOT_FOUND_COMMANDS_TO_CONSOLE:
                 logger.error(
-                    f"{ctx.author.display_name} (@{ctx.author.name}, id: {ctx.author.id}) used {ctx.message.content} but command `{ctx.message.content[len(ctx.prefix or ""):].split()[0]}` doesn't exist!"
+                    f"{ctx.author.display_name} (@{ctx.author.name}, id: {ctx.author.id}) used {ctx.message.content} but command `{ctx.message.content[len(ctx.prefix or ""):].split()[0]}` doesn't exist!",
+                    extra={
+                        "user_id": ctx.author.id,
+                        "channel_id": ctx.channel.id,
+                        "guild_id": ctx.guild.id if ctx.guild else None,
+                    },
                 )
 
             if config.COMMAND_NOT_FOUND_MESSAGE:
@@ -136,7 +141,13 @@ class Events(Cog):
         ):
             logger.info(
                 f"{interaction.user.display_name} (@{interaction.user.name}, id: {interaction.user.id}) used /{interaction.command.qualified_name} "
-                f"in channel: #{interaction.channel} ({interaction.channel.id if interaction.channel else None}) in guild: {interaction.guild} ({interaction.guild.id if interaction.guild else None})"
+                f"in channel: #{interaction.channel} ({interaction.channel.id if interaction.channel else None}) in guild: {interaction.guild} ({interaction.guild.id if interaction.guild else None})",
+                extra={
+                    "user_id": interaction.user.id,
+                    "channel_id": interaction.channel_id,
+                    "guild_id": interaction.guild_id,
+                    "command": interaction.command.qualified_name,
+                },
             )
         return True
 
@@ -137,6 +137,18 @@ class Utilities(Cog):
             name="Ping", value=f"Check with {self.bot.slash_mention('ping')}"
         )
 
+        http = self.bot.http_tracer.overall
+        if http.requests:
+            total = http["total"]
+            reuse = http.reuse_rate
+            embed.add_field(
+                name="HTTP",
+                value=f"`{http.requests:,}` requests\n"
+                f"`{(total.percentile(50) or 0) * 1000:.0f}ms` (p50) "
+                f"`{(total.percentile(95) or 0) * 1000:.0f}ms` (p95)\n"
+                f"`{reuse or 0:.0%}` connections reused",
+            )
+
         embed.set_thumbnail(url=self.bot.user.display_avatar)
 
         ephemeral = False
@@ -70,8 +70,121 @@ ITEMS_PER_PAGE = 5
 
 # LOGS_FOLDER               - The folder to store logs in.
 # LOG_FILE_NAME_TIME_FORMAT - Time format for the log filename.
+# LOG_QUEUE_SIZE            - The most log records waiting to be written by the logging thread. Records
+#                             logged while it is full are dropped and counted instead of slowing the bot down.
+# LOG_CONSOLE_FORMAT        - "text" for colored, human readable logs in the console or "json" for one JSON
+#                             object per line, with fields like `user_id` and `guild_id` for log tools to use.
+# LOG_FILE_FORMAT           - The same for the log files.
 LOGS_FOLDER = "./logs"
 LOG_FILENAME_TIME_FORMAT = "%Y-%m-%d %H-%M-%S"
+LOG_QUEUE_SIZE = 10_000
+LOG_CONSOLE_FORMAT = "text"
+LOG_FILE_FORMAT = "text"
+
+# HTTP_TIMEOUT                  - Total seconds an outgoing HTTP request is allowed to take.
+# HTTP_CONNECT_TIMEOUT          - Seconds to wait for a connection to be established (including
+#                                 waiting for a free connection from the pool).
+# HTTP_MAX_CONNECTIONS          - The maximum amount of open HTTP connections at once.
+# HTTP_MAX_CONNECTIONS_PER_HOST - The maximum amount of open HTTP connections to the same host.
+# HTTP_DNS_CACHE_TTL            - Seconds to cache DNS lookups for.
+# HTTP_KEEPALIVE_TIMEOUT        - Seconds to keep an idle connection open for reuse.
+HTTP_TIMEOUT = 30
+HTTP_CONNECT_TIMEOUT = 10
+HTTP_MAX_CONNECTIONS = 100
+HTTP_MAX_CONNECTIONS_PER_HOST = 10
+HTTP_DNS_CACHE_TTL = 300
+HTTP_KEEPALIVE_TIMEOUT = 30
+
+# HTTP_MAX_DOWNLOAD_SIZE - The maximum size in bytes of a downloaded file or page. Bigger downloads
+#                          are refused. Can be set to None to remove the limit.
+# HTTP_SPOOL_THRESHOLD   - Downloads into temporary files are kept in memory until they are bigger
+#                          than this many bytes, after which they are moved to disk.
+# HTTP_CHUNK_SIZE        - The size in bytes of the chunks downloads are read in.
+HTTP_MAX_DOWNLOAD_SIZE = 25 * 1024**2
+HTTP_SPOOL_THRESHOLD = 1024**2
+HTTP_CHUNK_SIZE = 64 * 1024
+
+# HTTP_HOST_RATE                  - The maximum amount of requests per second to the same host.
+# HTTP_HOST_BURST                 - The amount of requests to the same host that can be sent at once
+#                                   before HTTP_HOST_RATE kicks in.
+# HTTP_HOST_CONCURRENCY           - The maximum amount of requests to the same host at the same time.
+# HTTP_BREAKER_FAILURE_THRESHOLD  - Stop sending requests to a host after this many errors, timeouts
+#                                   or 5xx responses in a row.
+# HTTP_BREAKER_RECOVERY_TIMEOUT   - Seconds to wait before trying a failing host again.
+# HTTP_HOST_POLICIES              - Overrides of the values above for specific hosts, using the
+#                                   keys "rate", "burst", "concurrency", "failure_threshold" and
+#                                   "recovery_timeout".
+#                                   The Discord CDN serves avatars and attachments in bulk, so it gets
+#                                   higher limits by default.
+# Example: {"searx.example.com": {"rate": 2, "burst": 5}}
+HTTP_HOST_RATE = 10
+HTTP_HOST_BURST = 20
+HTTP_HOST_CONCURRENCY = 10
+HTTP_BREAKER_FAILURE_THRESHOLD = 5
+HTTP_BREAKER_RECOVERY_TIMEOUT = 30
+HTTP_HOST_POLICIES = {
+    "cdn.discordapp.com": {"rate": 100, "burst": 200, "concurrency": 50},
+    "media.discordapp.net": {"rate": 100, "burst": 200, "concurrency": 50},
+}
+
+# HTTP_CACHE_MEMORY_SIZE - The maximum total size in bytes of the HTTP responses cached in memory.
+# HTTP_CACHE_FOLDER      - The folder to cache HTTP responses in on disk. Can be set to None to only
+#                          cache in memory.
+# HTTP_CACHE_DISK_SIZE   - The maximum total size in bytes of the HTTP responses cached on disk.
+HTTP_CACHE_MEMORY_SIZE = 64 * 1024**2
+HTTP_CACHE_FOLDER = "./cache/http"
+HTTP_CACHE_DISK_SIZE = 1024**3
+
+# HTML_CONVERSION_WORKERS    - The amount of processes converting web pages to markdown.
+# HTML_CONVERSION_MAX_LENGTH - Web pages longer than this many characters are cut off before being
+#                              converted to markdown. Can be set to None to remove the limit.
+# HTML_CONVERSION_TIMEOUT    - Seconds to wait for a web page to be converted to markdown.
+HTML_CONVERSION_WORKERS = 2
+HTML_CONVERSION_MAX_LENGTH = 2_000_000
+HTML_CONVERSION_TIMEOUT = 10
+
+# WEB_RESEARCH_FETCHERS     - The amount of search results `research_web` reads at the same time.
+# WEB_RESEARCH_PAGE_TIMEOUT - Seconds `research_web` gives every web page to be downloaded and converted
+#                             to markdown before skipping it.
+WEB_RESEARCH_FETCHERS = 5
+WEB_RESEARCH_PAGE_TIMEOUT = 15
+
+# IMAGE_WORKERS                 - The amount of processes decoding and analyzing images for `bot.images`.
+# IMAGE_QUEUE_SIZE              - The most images waiting to be analyzed, callers wait for a free spot after
+#                                 that.
+# IMAGE_SHARED_MEMORY_THRESHOLD - Images bigger than this many bytes are handed to the workers through shared
+#                                 memory instead of being copied through a pipe.
+# IMAGE_JOB_TIMEOUT             - Seconds to wait for an image to be analyzed.
+# IMAGE_BATCH_DOWNLOADS         - The most images a batch of dominant colors downloads at the same time.
+IMAGE_WORKERS = 2
+IMAGE_QUEUE_SIZE = 100
+IMAGE_SHARED_MEMORY_THRESHOLD = 256 * 1024  # 256 KiB
+IMAGE_JOB_TIMEOUT = 30
+IMAGE_BATCH_DOWNLOADS = 8
+
+# IMAGE_MAX_PIXELS    - The most pixels an image may be decoded at (after decoding at a reduced scale where
+#                       the format allows it). Bigger images are refused without being decoded.
+# IMAGE_MEMORY_BUDGET - The most memory in bytes images being decoded at the same time may take, in the bot
+#                       process and the image workers together. Decodes wait until enough of it is free.
+IMAGE_MAX_PIXELS = 40_000_000
+IMAGE_MEMORY_BUDGET = 512 * 1024**2  # 512 MiB
+
+# IMAGE_ANIMATION_FRAMES     - The most frames of an animated GIF or WebP looked at when analyzing it, evenly
+#                              spaced through the animation.
+# IMAGE_ANIMATION_MAX_PIXELS - Frames can only be decoded one after another, so frames are only picked from as
+#                              far into an animation as decoding this many pixels reaches.
+IMAGE_ANIMATION_FRAMES = 4
+IMAGE_ANIMATION_MAX_PIXELS = 4_000_000
+
+# COLOR_CACHE_MEMORY_ENTRIES - The most dominant colors to keep in memory.
+# COLOR_CACHE_PATH           - The SQLite database to keep dominant colors in across restarts. Can be set to
+#                              None to only keep them in memory.
+COLOR_CACHE_MEMORY_ENTRIES = 10_000
+COLOR_CACHE_PATH = "./cache/colors.db"
+
+# SEARCH_INDEX_IDLE_TIMEOUT - Seconds a guild's member and role search index is kept in memory after
+#                             it was last searched. It is rebuilt on the next search after that.
+SEARCH_INDEX_IDLE_TIMEOUT = 30 * 60
 
 # COGS_EXCLUDE - Comma seperated list of cogs to exclude on runtime.
 # Example: ["developer", "test"]
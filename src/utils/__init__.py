@@ -2,10 +2,14 @@ from .bot import *
 from .colors import *
 from .console import *
 from .formatters import *
+from .http_policies import *
+from .http_tracing import *
 from .images import *
 from .internet import *
 from .iterables import *
 from .logger import *
 from .module import *
+from .processes import *
 from .searchers import *
 from .values import *
+from .webpages import *
@@ -0,0 +1,290 @@
+import time
+import asyncio
+from typing import Any, AsyncIterator, Callable, Generic, Literal, Optional, TypeVar
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from .. import config
+
+import aiohttp
+
+__all__ = (
+    "CircuitOpenError",
+    "TokenBucket",
+    "CircuitBreaker",
+    "HostPolicy",
+    "HostMap",
+    "get_host_policy",
+    "get_host_policies",
+)
+
+V = TypeVar("V")
+
+# The most hosts to keep policies, timings and such for, the least recently used ones are forgotten first
+MAX_TRACKED_HOSTS = 1024
+
+
+class CircuitOpenError(aiohttp.ClientError):
+    """Raised instead of making a request to a host whose circuit breaker is open."""
+
+    def __init__(self, host: str, retry_after: float) -> None:
+        super().__init__(
+            f"{host} is failing, not sending requests to it for another {retry_after:.0f}s"
+        )
+        self.host = host
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    A token bucket rate limiter.
+
+    Holds up to `capacity` tokens and gains `rate` tokens a second. Every request takes a token, waiting for one if
+    the bucket is empty, so bursts of up to `capacity` requests go through right away and the long-term rate is
+    capped at `rate` requests a second.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        """Take a token, waiting until one is available."""
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to a host after repeated failures.
+
+    The breaker starts closed. After `failure_threshold` failures in a row it opens and every request fails fast with
+    `CircuitOpenError`. Once `recovery_timeout` seconds have passed it half-opens and lets a single probe request
+    through: if the probe succeeds the breaker closes again, otherwise it opens for another `recovery_timeout`.
+    """
+
+    State = Literal["closed", "open", "half-open"]
+
+    def __init__(
+        self, host: str, *, failure_threshold: int, recovery_timeout: float
+    ) -> None:
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+
+        self.state: CircuitBreaker.State = "closed"
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.recovery_timeout - time.monotonic())
+
+    def before_request(self) -> None:
+        """Raise `CircuitOpenError` if a request must not be sent right now."""
+        if self.state == "open":
+            if self.retry_after > 0:
+                raise CircuitOpenError(self.host, self.retry_after)
+            self.state = "half-open"
+
+        if self.state == "half-open":
+            if self._probing:
+                raise CircuitOpenError(self.host, self.recovery_timeout)
+            self._probing = True
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half-open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+
+def _is_failure(error: BaseException) -> bool:
+    """Whether an error means the host is unhealthy, as opposed to a bad request."""
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status >= 500
+    return isinstance(error, (aiohttp.ClientConnectionError, asyncio.TimeoutError))
+
+
+class _Attempt:
+    __slots__ = ("failed",)
+
+    def __init__(self) -> None:
+        self.failed = False
+
+    def fail(self) -> None:
+        """Mark the request as failed without raising, for example on a 5xx response."""
+        self.failed = True
+
+
+class HostPolicy:
+    """The rate limit, concurrency cap and circuit breaker for requests to a single host."""
+
+    def __init__(
+        self,
+        host: str,
+        *,
+        rate: float = config.HTTP_HOST_RATE,
+        burst: float = config.HTTP_HOST_BURST,
+        concurrency: int = config.HTTP_HOST_CONCURRENCY,
+        failure_threshold: int = config.HTTP_BREAKER_FAILURE_THRESHOLD,
+        recovery_timeout: float = config.HTTP_BREAKER_RECOVERY_TIMEOUT,
+    ) -> None:
+        self.host = host
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.breaker = CircuitBreaker(
+            host, failure_threshold=failure_threshold, recovery_timeout=recovery_timeout
+        )
+
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.total_latency = 0.0
+        self.last_latency: Optional[float] = None
+
+    @property
+    def average_latency(self) -> Optional[float]:
+        return self.total_latency / self.requests if self.requests else None
+
+    def _finish(self, started_at: float, failed: bool) -> None:
+        latency = time.perf_counter() - started_at
+        self.requests += 1
+        self.total_latency += latency
+        self.last_latency = latency
+
+        if failed:
+            self.errors += 1
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    @asynccontextmanager
+    async def request(self) -> AsyncIterator[_Attempt]:
+        """
+        Wrap a request to the host.
+
+        Fails fast with `CircuitOpenError` while the breaker is open, otherwise waits for the rate limit and a free
+        concurrency slot. Connection errors, timeouts and 5xx `aiohttp.ClientResponseError`s raised inside count as
+        failures; call `fail` on the yielded object for 5xx responses that aren't raised.
+        """
+        self.breaker.before_request()
+        try:
+            await self.bucket.acquire()
+            await self.semaphore.acquire()
+        except BaseException:
+            self.breaker._probing = False
+            raise
+
+        self.in_flight += 1
+        attempt = _Attempt()
+        started_at = time.perf_counter()
+        try:
+            yield attempt
+        except asyncio.CancelledError:
+            # Cancelling says nothing about the health of the host
+            self.breaker._probing = False
+            raise
+        except BaseException as e:
+            self._finish(started_at, failed=_is_failure(e))
+            raise
+        else:
+            self._finish(started_at, failed=attempt.failed)
+        finally:
+            self.in_flight -= 1
+            self.semaphore.release()
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "host": self.host,
+            "state": self.breaker.state,
+            "failures": self.breaker.failures,
+            "retry_after": self.breaker.retry_after,
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "average_latency": self.average_latency,
+            "last_latency": self.last_latency,
+        }
+
+
+class HostMap(Generic[V]):
+    """
+    Values kept per host, created with `factory` on first use.
+
+    Only the `max_hosts` most recently used hosts are kept, the least recently used ones are forgotten first. Host
+    names are lowercased.
+    """
+
+    def __init__(
+        self, factory: Callable[[str], V], *, max_hosts: int = MAX_TRACKED_HOSTS
+    ) -> None:
+        self.factory = factory
+        self.max_hosts = max_hosts
+        self._values: OrderedDict[str, V] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def get(self, host: str) -> Optional[V]:
+        """Get the value of a host without creating it or marking it as used."""
+        return self._values.get(host.lower())
+
+    def use(self, host: str) -> V:
+        """Get the value of a host, creating it if needed, and mark it as the most recently used."""
+        host = host.lower()
+        value = self._values.get(host)
+        if value is not None:
+            self._values.move_to_end(host)
+            return value
+
+        value = self._values[host] = self.factory(host)
+        while len(self._values) > self.max_hosts:
+            self._values.popitem(last=False)
+        return value
+
+    def values(self) -> list[V]:
+        """Get the values of every host, most recently used first."""
+        return list(reversed(self._values.values()))
+
+    def clear(self) -> None:
+        self._values.clear()
+
+
+_policies: HostMap[HostPolicy] = HostMap(
+    lambda host: HostPolicy(host, **config.HTTP_HOST_POLICIES.get(host, {}))
+)
+
+
+def get_host_policy(host: str) -> HostPolicy:
+    """Get the policy for a host, creating it from `HTTP_HOST_POLICIES` and the defaults in the config if needed."""
+    return _policies.use(host)
+
+
+def get_host_policies() -> list[HostPolicy]:
+    """Get the policies of every host requests were made to, most recently used first."""
+    return _policies.values()
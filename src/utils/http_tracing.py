@@ -0,0 +1,241 @@
+import time
+from bisect import bisect_left
+from types import SimpleNamespace
+from typing import Any, Optional
+
+from .http_policies import HostMap
+
+import aiohttp
+
+__all__ = (
+    "LatencyHistogram",
+    "HostTimings",
+    "HTTPTracer",
+)
+
+# Upper bounds of the histogram buckets in seconds, anything slower goes in a last overflow bucket
+HISTOGRAM_BOUNDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # fmt: skip
+
+# The phases of a request that are timed:
+# queue:   waiting for a free connection in the pool
+# dns:     resolving the host name, only when it wasn't in the DNS cache
+# connect: opening a new connection, the TCP and (for https) TLS handshakes, without DNS
+# ttfb:    from sending the request headers until the response headers arrived
+# total:   from starting the request until the final response headers arrived, including redirects
+PHASES = ("queue", "dns", "connect", "ttfb", "total")
+
+
+class LatencyHistogram:
+    """A histogram of durations in seconds with fixed, roughly logarithmic buckets."""
+
+    bounds = HISTOGRAM_BOUNDS
+
+    def __init__(self) -> None:
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.buckets[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """
+        Estimate a percentile of the durations.
+
+        Returns:
+            Optional[float]: The upper bound of the bucket the percentile falls in, capped at the slowest duration
+                seen, or None if nothing was observed.
+        """
+        if not self.count:
+            return None
+
+        rank = max(1, round(self.count * percent / 100))
+        seen = 0
+        for bound, count in zip(self.bounds, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "max": self.max if self.count else None,
+            "buckets": dict(zip((*self.bounds, float("inf")), self.buckets)),
+        }
+
+
+class HostTimings:
+    """Phase timings and connection pool usage of the requests to a single host."""
+
+    def __init__(self, host: str) -> None:
+        self.host = host
+        self.phases = {phase: LatencyHistogram() for phase in PHASES}
+
+        self.requests = 0
+        self.errors = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.dns_cache_hits = 0
+        self.dns_cache_misses = 0
+
+    def __getitem__(self, phase: str) -> LatencyHistogram:
+        return self.phases[phase]
+
+    @property
+    def reuse_rate(self) -> Optional[float]:
+        """The fraction of requests that got an already open connection from the pool."""
+        connections = self.new_connections + self.reused_connections
+        return self.reused_connections / connections if connections else None
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "host": self.host,
+            "requests": self.requests,
+            "errors": self.errors,
+            "new_connections": self.new_connections,
+            "reused_connections": self.reused_connections,
+            "reuse_rate": self.reuse_rate,
+            "dns_cache_hits": self.dns_cache_hits,
+            "dns_cache_misses": self.dns_cache_misses,
+            **{phase: histogram.to_dict() for phase, histogram in self.phases.items()},
+        }
+
+
+class HTTPTracer:
+    """
+    Records where the time of HTTP requests goes, per host.
+
+    Pass `trace_config` to the `trace_configs` of an aiohttp.ClientSession to trace its requests. Timings are keyed
+    by the host of the requested URL, and every request is also counted in `overall`.
+    """
+
+    def __init__(self) -> None:
+        self.overall = HostTimings("*")
+        self._hosts: HostMap[HostTimings] = HostMap(HostTimings)
+
+        self.trace_config = aiohttp.TraceConfig()
+        self.trace_config.on_request_start.append(self._on_request_start)
+        self.trace_config.on_connection_queued_start.append(self._on_queued_start)
+        self.trace_config.on_connection_queued_end.append(self._on_queued_end)
+        self.trace_config.on_connection_create_start.append(self._on_create_start)
+        self.trace_config.on_connection_create_end.append(self._on_create_end)
+        self.trace_config.on_connection_reuseconn.append(self._on_reuseconn)
+        self.trace_config.on_dns_resolvehost_start.append(self._on_dns_start)
+        self.trace_config.on_dns_resolvehost_end.append(self._on_dns_end)
+        self.trace_config.on_dns_cache_hit.append(self._on_dns_cache_hit)
+        self.trace_config.on_dns_cache_miss.append(self._on_dns_cache_miss)
+        self.trace_config.on_request_headers_sent.append(self._on_headers_sent)
+        self.trace_config.on_request_end.append(self._on_request_end)
+        self.trace_config.on_request_exception.append(self._on_request_exception)
+
+    def get(self, host: str) -> Optional[HostTimings]:
+        """Get the timings of a host, if any requests were made to it."""
+        return self._hosts.get(host)
+
+    def hosts(self) -> list[HostTimings]:
+        """Get the timings of every host requests were made to, most recently used first."""
+        return self._hosts.values()
+
+    def clear(self) -> None:
+        self.overall = HostTimings("*")
+        self._hosts.clear()
+
+    def _observe(self, ctx: SimpleNamespace, phase: str, seconds: float) -> None:
+        self._hosts.use(ctx.host)[phase].observe(seconds)
+        self.overall[phase].observe(seconds)
+
+    def _count(self, ctx: SimpleNamespace, counter: str) -> None:
+        timings = self._hosts.use(ctx.host)
+        setattr(timings, counter, getattr(timings, counter) + 1)
+        setattr(self.overall, counter, getattr(self.overall, counter) + 1)
+
+    async def _on_request_start(
+        self, session: aiohttp.ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        ctx.host = (params.url.host or "_").lower()
+        ctx.started_at = time.perf_counter()
+        ctx.headers_sent_at = None
+
+    async def _on_queued_start(
+        self, session: aiohttp.ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        ctx.queued_at = time.perf_counter()
+
+    async def _on_queued_end(
+        self, session: aiohttp.ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        self._observe(ctx, "queue", time.perf_counter() - ctx.queued_at)
+
+    async def _on_create_start(
+        self, session: aiohttp.ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        ctx.connecting_at = time.perf_counter()
+        ctx.dns_time = 0.0
+
+    async def _on_create_end(
+        self, session: aiohttp.ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        # DNS is resolved while the connection is created, it has its own histogram
+        connect_time = time.perf_counter() - ctx.connecting_at - ctx.dns_time
+        self._observe(ctx, "connect", connect_time)
+        self._count(ctx, "new_connections")
+
+    async def _on_reuseconn(
+        self, session: aiohttp.ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        self._count(ctx, "reused_connections")
+
+    async def _on_dns_start(
+        self, session: aiohttp.ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        ctx.resolving_at = time.perf_counter()
+
+    async def _on_dns_end(
+        self, session: aiohttp.ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        dns_time = time.perf_counter() - ctx.resolving_at
+        ctx.dns_time = getattr(ctx, "dns_time", 0.0) + dns_time
+        self._observe(ctx, "dns", dns_time)
+
+    async def _on_dns_cache_hit(
+        self, session: aiohttp.ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        self._count(ctx, "dns_cache_hits")
+
+    async def _on_dns_cache_miss(
+        self, session: aiohttp.ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        self._count(ctx, "dns_cache_misses")
+
+    async def _on_headers_sent(
+        self, session: aiohttp.ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        # Sent again for every redirect, so the time to first byte is the one of the final response
+        ctx.headers_sent_at = time.perf_counter()
+
+    async def _on_request_end(
+        self, session: aiohttp.ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        now = time.perf_counter()
+        if ctx.headers_sent_at is not None:
+            self._observe(ctx, "ttfb", now - ctx.headers_sent_at)
+        self._observe(ctx, "total", now - ctx.started_at)
+        self._count(ctx, "requests")
+
+    async def _on_request_exception(
+        self, session: aiohttp.ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        self._count(ctx, "requests")
+        self._count(ctx, "errors")
@@ -1,95 +1,1323 @@
+import os
+import re
+import time
+import asyncio
+import hashlib
+import sqlite3
+import threading
 from io import BytesIO
-from typing import TYPE_CHECKING, Optional
+from typing import Any, AsyncIterator, Callable, Iterable, Optional, Sequence, TypeVar
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
 
-from .internet import get_raw_content_data
+from .. import config
+from .internet import (
+    HTTPCache,
+    SingleFlight,
+    ensure_session,
+    get_default_cache,
+    get_raw_content_data,
+    http_get,
+    is_cacheable,
+    iter_response,
+)
+from .http_tracing import LatencyHistogram
+from .logger import get_logger
+from .processes import ProcessPool
 
 import aiohttp
+import discord
 import numpy as np
+from yarl import URL
 from PIL import Image
 from PIL.Image import Image as PILImage
-from sklearn.cluster import KMeans
 
 __all__ = (
+    "ImageTooLargeError",
+    "DecodeBudget",
+    "ImageAnalysis",
+    "ColorResult",
+    "PaletteColor",
+    "ColorCache",
+    "ImageService",
+    "color_cache_key",
+    "sized_image_url",
+    "get_decode_budget",
+    "decode_cost",
     "fetch_image",
+    "fetch_frames",
+    "open_image",
+    "open_frames",
+    "analyze_image",
     "get_dominant_color",
+    "get_palette",
 )
 
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# Luminance of an RGB color (perceptual model): 0.2126*R + 0.7152*G + 0.0722*B, in 256ths
+LUMINANCE = (54, 183, 19)
+
+# Decoding scales images down to at most this many times the requested size, the final resize does the rest
+THUMBNAIL_REDUCING_GAP = 2.0
+
+# The largest width or height get_dominant_color looks at by default, bigger images are sampled down to it
+DOMINANT_COLOR_SAMPLE_SIZE = 64
+
+# Decoding holds about two copies of every pixel at 4 bytes each: the decoded image and its RGB(A) conversion
+DECODE_BYTES_PER_PIXEL = 8
+
+# Bits kept per color channel when building the color histogram, 5 bits gives 32^3 bins
+HISTOGRAM_BITS = 5
+
+# How many histogram bins around a palette color are left out when picking the next one, so the colors of a palette
+# are at least this many bins plus one apart
+PALETTE_SEPARATION = 2
+
+# The size images are decoded at for analyze_image
+ANALYSIS_SIZE = (256, 256)
+
+# Discord never changes what is behind a CDN path, new avatars, icons and attachments always get a new one
+DISCORD_CDN_HOSTS = ("cdn.discordapp.com", "media.discordapp.net")
+EXTENSION_RE = re.compile(r"\.[a-zA-Z0-9]+$")
+
+# The sizes the Discord CDN resizes images to with `?size=`, and the paths it does it for. Attachments and default
+# avatars are always sent as they are
+DISCORD_CDN_SIZES = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+DISCORD_RESIZABLE_PATH_RE = re.compile(
+    r"^/(avatars|icons|banners|splashes|discovery-splashes|app-icons|role-icons|emojis"
+    r"|guilds/\d+/users/\d+/(avatars|banners))/"
+)
+
+# Extensions of static images the Discord CDN can send as WebP instead, a fraction of the size of a PNG
+DISCORD_STATIC_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+# Stop trying to read the header of an image being downloaded once this many bytes arrived without it being recognized
+HEADER_PROBE_LIMIT = 1024**2
+
+# JPEG markers: the start of frame of every kind of JPEG (C4, C8 and CC are other markers in the same range), those
+# of progressive JPEGs and the start of a scan
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+JPEG_PROGRESSIVE_SOF_MARKERS = frozenset((0xC2, 0xC6, 0xCA, 0xCE))
+JPEG_SOS_MARKER = 0xDA
+JPEG_EOI = b"\xff\xd9"
+
+# A marker in the middle of entropy-coded data: 0xFF followed by anything but a stuffed zero, fill or a restart marker
+JPEG_SCAN_END_RE = re.compile(rb"\xff[^\x00\xff\xd0-\xd7]")
+
+# A JPEG decoded at 1/8 of its size only uses the DC coefficient of every block
+JPEG_DC_ONLY_SCALE = 8
+
+
+class ImageTooLargeError(Image.DecompressionBombError):
+    """Raised instead of decoding an image that would take more pixels or memory than allowed."""
+
+
+class DecodeBudget:
+    """
+    Caps the memory taken by images being decoded at the same time.
+
+    Every decode reserves its estimated memory with `reserve` and waits while the reservations would go over
+    `limit` bytes.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.in_use = 0
+        self._waiters: list[asyncio.Future[None]] = []
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, nbytes: int) -> None:
+        """
+        Take `nbytes` of the budget, waiting until they are free. Give them back with `release`.
+
+        Raises:
+            ImageTooLargeError: `nbytes` is more than the whole budget.
+        """
+        if nbytes > self.limit:
+            raise ImageTooLargeError(
+                f"decoding the image would take {nbytes:,} bytes, more than the budget of {self.limit:,} bytes"
+            )
+
+        while self.in_use + nbytes > self.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                self._waiters.remove(waiter)
+
+        self.in_use += nbytes
+
+    def release(self, nbytes: int) -> None:
+        self.in_use -= nbytes
+        # Everyone waiting checks again whether they fit now
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    @asynccontextmanager
+    async def reserve(self, nbytes: int) -> AsyncIterator[None]:
+        """Hold `nbytes` of the budget for the duration of the block, see `acquire`."""
+        await self.acquire(nbytes)
+        try:
+            yield
+        finally:
+            self.release(nbytes)
+
+
+_decode_budget = DecodeBudget(config.IMAGE_MEMORY_BUDGET)
+
+# Concurrent fetches of the same image share a single download
+_downloads: SingleFlight[bytes] = SingleFlight()
+
+
+def get_decode_budget() -> DecodeBudget:
+    """Get the budget shared by every image decode, see `IMAGE_MEMORY_BUDGET` in the config."""
+    return _decode_budget
+
+
+@dataclass
+class ImageAnalysis:
+    format: Optional[str]
+    width: int
+    height: int
+    mode: str
+    frames: int
+    color: tuple[int, int, int]
+    decode_time: float
+    analysis_time: float
+
+
+@dataclass
+class ColorResult:
+    source: "str | discord.Asset"
+    color: Optional[tuple[int, int, int]]
+    error: Optional[Exception] = None
+
+
+@dataclass
+class PaletteColor:
+    color: tuple[int, int, int]
+    share: float
+
+
+class _ProgressiveJpegWatcher:
+    """
+    Follows the markers of a progressive JPEG while it downloads to find where the first scans of the DC coefficients
+    of all its components end.
+
+    Progressive JPEGs send a coarse version of the whole image first, the DC scans hold the average color of every
+    8x8 block. That is all a decode at 1/8 scale uses, so the rest of the file doesn't need to be downloaded.
+    """
+
+    def __init__(self) -> None:
+        self.position = 2  # right after the start of image marker
+        self.finished = False
+        self._in_scan = False
+        self._components: set[int] = set()
+        self._dc_scanned: set[int] = set()
+
+    def advance(self, data: memoryview) -> Optional[int]:
+        """
+        Read the markers in the data downloaded so far, continuing where the last call stopped.
+
+        Returns:
+            Optional[int]: The offset where the DC scans end, everything from there on can be dropped. None if it
+                wasn't reached yet, or never will be once `finished` is set.
+        """
+        while not self.finished:
+            if self._in_scan:
+                match = JPEG_SCAN_END_RE.search(data, self.position)
+                if match is None:
+                    # A marker could start with the last byte
+                    self.position = max(self.position, len(data) - 1)
+                    return None
+
+                self.position = match.start()
+                self._in_scan = False
+                if self._components and self._components <= self._dc_scanned:
+                    self.finished = True
+                    return self.position
+
+            position = self.position
+            if position + 4 > len(data):
+                return None
+            if data[position] != 0xFF:
+                self.finished = True
+                return None
+
+            marker = data[position + 1]
+            if marker == 0xFF:
+                self.position += 1
+                continue
+            if 0xD0 <= marker <= 0xD8 or marker == 0x01:
+                self.position += 2
+                continue
+            if marker == JPEG_EOI[1]:
+                self.finished = True
+                return None
+
+            end = position + 2 + (data[position + 2] << 8 | data[position + 3])
+            if end > len(data):
+                return None
+
+            if marker in JPEG_SOF_MARKERS:
+                if marker not in JPEG_PROGRESSIVE_SOF_MARKERS:
+                    self.finished = True
+                    return None
+                # Every component is described in 3 bytes after the precision, size and component count
+                self._components = {
+                    data[position + 10 + 3 * i] for i in range(data[position + 9])
+                }
+            elif marker == JPEG_SOS_MARKER:
+                # The component count, 2 bytes per component, then the spectral selection and approximation
+                count = data[position + 4]
+                spectral_start = data[position + 5 + 2 * count]
+                approximation_high = data[position + 7 + 2 * count] >> 4
+                if spectral_start == 0 and approximation_high == 0:
+                    self._dc_scanned.update(
+                        data[position + 5 + 2 * i] for i in range(count)
+                    )
+                self._in_scan = True
+
+            self.position = end
+
+        return None
+
+
+def _probe_header(buffer: BytesIO) -> Optional[PILImage]:
+    """Open the image downloaded so far in `buffer` if its header arrived, leaving `buffer` positioned at its end."""
+    buffer.seek(0)
+    try:
+        return Image.open(buffer)
+    except OSError:
+        return None
+    finally:
+        buffer.seek(0, os.SEEK_END)
+
+
+async def _download_image(
+    url: str,
+    *,
+    session: aiohttp.ClientSession,
+    size: Optional[tuple[int, int]],
+    max_size: Optional[int],
+    http_cache: Optional[HTTPCache],
+    **kwargs,
+) -> bytes:
+    buffer = BytesIO()
+    cost: Optional[int] = None
+    watcher: Optional[_ProgressiveJpegWatcher] = None
+    cut: Optional[int] = None
+
+    try:
+        async with http_get(session, url, **kwargs) as response:
+            async for chunk in iter_response(response, max_size=max_size):
+                buffer.write(chunk)
+
+                # Check the image and wait for room in the decode budget as soon as the header is in, refusing
+                # images that are too large before downloading the rest of them
+                if cost is None and buffer.tell() <= HEADER_PROBE_LIMIT:
+                    header = _probe_header(buffer)
+                    if header is not None:
+                        _plan_decode(header, size)
+                        cost = header.width * header.height * DECODE_BYTES_PER_PIXEL
+                        await _decode_budget.acquire(cost)
+                        if (
+                            header.format == "JPEG"
+                            and header.info.get("progressive")
+                            and header.decoderconfig[:1] == (JPEG_DC_ONLY_SCALE,)
+                        ):
+                            watcher = _ProgressiveJpegWatcher()
+
+                if watcher is not None and not watcher.finished:
+                    with buffer.getbuffer() as view:
+                        cut = watcher.advance(view)
+                    if cut is not None:
+                        break
+
+            if cut is not None:
+                buffer.seek(cut)
+                buffer.truncate()
+                buffer.write(JPEG_EOI)
+
+            data = buffer.getvalue()
+            if cut is None and http_cache is not None:
+                await http_cache.store(url, response, data)
+
+        return data
+
+    finally:
+        if cost is not None:
+            _decode_budget.release(cost)
+
 
 async def fetch_image(
-    image_url: str, *args, session: Optional[aiohttp.ClientSession] = None, **kwargs
+    image_url: "str | discord.Asset",
+    *,
+    session: Optional[aiohttp.ClientSession] = None,
+    size: Optional[tuple[int, int]] = None,
+    cache: bool = True,
+    max_size: Optional[int] = config.HTTP_MAX_DOWNLOAD_SIZE,
+    **kwargs,
 ) -> PILImage:
     """
     Fetches an image from a URL asynchronously and returns a PIL Image object.
 
+    The image is streamed: its header is checked as soon as it arrives, so images that are too large are refused
+    without downloading them, and progressive JPEGs decoded at 1/8 scale or less stop downloading once their first,
+    coarse pass is in. Concurrent fetches of the same image share a single download.
+
     Args:
-        image_url (str): The URL of the image to fetch.
+        image_url (str | discord.Asset): The URL of the image to fetch, or a Discord asset.
         session (Optional[aiohttp.ClientSession]): An optional aiohttp ClientSession to use for the request.
-            If not provided, a new session will be created.
+            If not provided, the bot's shared session is used.
+        size (Optional[tuple[int, int]]): The largest size the image is needed at. Bigger images are scaled down to
+            fit while keeping their aspect ratio, while they are decoded where the format allows it. Discord assets
+            and CDN URLs are requested at the smallest size covering it, see `sized_image_url`. None to keep the
+            full resolution.
+        cache (bool): Whether to go through the default `HTTPCache`, if one is set. Fresh cached images are used as
+            they are, complete downloads are stored.
+        max_size (Optional[int]): The maximum size of the image in bytes, None for no limit.
+
+    Raises:
+        ImageTooLargeError: The image would take more pixels or memory to decode than allowed, see
+            `IMAGE_MAX_PIXELS` and `IMAGE_MEMORY_BUDGET` in the config.
+        ContentTooLargeError: The image is bigger than `max_size` bytes.
+
+    Returns:
+        PILImage: The image object, in RGBA if it has transparency and RGB otherwise.
+    """
+    return await _fetch(
+        image_url,
+        lambda image: _prepare_image(image, size),
+        session=session,
+        size=size,
+        cache=cache,
+        max_size=max_size,
+        **kwargs,
+    )
+
+
+async def fetch_frames(
+    image_url: "str | discord.Asset",
+    *,
+    session: Optional[aiohttp.ClientSession] = None,
+    size: Optional[tuple[int, int]] = None,
+    frames: int = config.IMAGE_ANIMATION_FRAMES,
+    cache: bool = True,
+    max_size: Optional[int] = config.HTTP_MAX_DOWNLOAD_SIZE,
+    **kwargs,
+) -> list[PILImage]:
+    """
+    Fetches an image like `fetch_image`, returning up to `frames` evenly spaced frames if it is animated.
+
+    See `open_frames` for how the frames are picked.
+
+    Returns:
+        list[PILImage]: The frames, in RGBA if they have transparency and RGB otherwise. A single one for still
+            images.
+    """
+    return await _fetch(
+        image_url,
+        lambda image: _prepare_frames(image, size, frames),
+        session=session,
+        size=size,
+        frames=frames,
+        cache=cache,
+        max_size=max_size,
+        **kwargs,
+    )
+
+
+async def _fetch(
+    image_url: "str | discord.Asset",
+    decode: Callable[[PILImage], T],
+    *,
+    session: Optional[aiohttp.ClientSession],
+    size: Optional[tuple[int, int]],
+    frames: int = 1,
+    cache: bool,
+    max_size: Optional[int],
+    **kwargs,
+) -> T:
+    if size is None:
+        url = _source_url(image_url)
+    else:
+        url = sized_image_url(image_url, max(size))
+
+    http_cache = get_default_cache() if cache and is_cacheable(kwargs) else None
+    cached = await http_cache.get_fresh(url) if http_cache is not None else None
+    if cached is not None:
+        data = cached.body
+    else:
+        session = ensure_session(session)
+
+        async def download() -> bytes:
+            return await _download_image(
+                url,
+                session=session,
+                size=size,
+                max_size=max_size,
+                http_cache=http_cache,
+                **kwargs,
+            )
+
+        # Requests with caller-specific options can't be shared
+        if kwargs:
+            data = await download()
+        else:
+            data = await _downloads.run(
+                (url, id(session), size, http_cache is not None, max_size), download
+            )
+
+    # Every caller decodes its own copy, images are mutable
+    async with _decode_budget.reserve(decode_cost(data, size=size, frames=frames)):
+        return decode(Image.open(BytesIO(data)))
+
+
+def _plan_decode(image: PILImage, size: Optional[tuple[int, int]]) -> None:
+    """
+    Pick a reduced decode scale for JPEGs bigger than `size`, then check the size the image will be decoded at.
+
+    Only looks at the header, nothing is decoded yet.
+
+    Raises:
+        ImageTooLargeError: The image would be decoded at more than `IMAGE_MAX_PIXELS` pixels.
+    """
+    if size is not None and (image.width > size[0] or image.height > size[1]):
+        if image.format == "JPEG":
+            image.draft("RGB", size)
+
+    if image.width * image.height > config.IMAGE_MAX_PIXELS:
+        raise ImageTooLargeError(
+            f"image of {image.width}x{image.height} pixels is over the limit of {config.IMAGE_MAX_PIXELS:,} pixels"
+        )
+
+
+def decode_cost(
+    data: "bytes | BytesIO",
+    *,
+    size: Optional[tuple[int, int]] = None,
+    frames: int = 1,
+) -> int:
+    """
+    Estimate the memory in bytes decoding an image at `size` would take, from its header.
+
+    With `frames` above 1, animations are counted like `open_frames` decodes them: the frame being drawn plus a full
+    size copy of each frame it picks.
+
+    Raises:
+        PIL.UnidentifiedImageError: The data is not an image Pillow can open.
+        ImageTooLargeError: The image would be decoded at more than `IMAGE_MAX_PIXELS` pixels.
+    """
+    image = Image.open(BytesIO(data) if isinstance(data, bytes) else data)
+    _plan_decode(image, size)
+    copies = 1
+    if frames > 1 and getattr(image, "is_animated", False):
+        copies += len(_frame_indices(image, frames))
+    return image.width * image.height * DECODE_BYTES_PER_PIXEL * copies
+
+
+def _prepare_image(image: PILImage, size: Optional[tuple[int, int]]) -> PILImage:
+    _plan_decode(image, size)
+    if size is not None and (image.width > size[0] or image.height > size[1]):
+        image.thumbnail(size, reducing_gap=THUMBNAIL_REDUCING_GAP)
+
+    has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+    return image.convert("RGBA" if has_alpha else "RGB")
+
+
+def open_image(data: bytes, *, size: Optional[tuple[int, int]] = None) -> PILImage:
+    """
+    Decode an image, scaling it down to fit in `size` if given.
+
+    JPEGs are decoded straight at a reduced scale with `Image.draft`; other formats are decoded and then shrunk with
+    `Image.reduce` before resampling to the final size.
+
+    Raises:
+        ImageTooLargeError: The image would be decoded at more than `IMAGE_MAX_PIXELS` pixels.
+
+    Returns:
+        PILImage: The image, in RGBA if it has transparency and RGB otherwise.
+    """
+    return _prepare_image(Image.open(BytesIO(data)), size)
+
+
+def _frame_indices(image: PILImage, frames: int) -> list[int]:
+    """
+    Pick up to `frames` evenly spaced frames of an animation.
+
+    Reaching a frame means decoding every frame before it, so only the frames within the first
+    `IMAGE_ANIMATION_MAX_PIXELS` pixels of the animation are picked from.
+    """
+    count = getattr(image, "n_frames", 1)
+    reachable = config.IMAGE_ANIMATION_MAX_PIXELS // max(1, image.width * image.height)
+    last = max(0, min(count, reachable) - 1)
+    return sorted({round(last * i / max(1, frames - 1)) for i in range(frames)})
+
+
+def _prepare_frames(
+    image: PILImage, size: Optional[tuple[int, int]], frames: int
+) -> list[PILImage]:
+    # Checked on the header, before seeking or copying decodes any frame
+    _plan_decode(image, size)
+    if frames <= 1 or not getattr(image, "is_animated", False):
+        return [_prepare_image(image, size)]
+
+    # Frames are copied before being scaled down, the animation is drawn on top of the full size previous frame
+    result = []
+    for index in _frame_indices(image, frames):
+        image.seek(index)
+        result.append(_prepare_image(image.copy(), size))
+    return result
+
+
+def open_frames(
+    data: bytes,
+    *,
+    size: Optional[tuple[int, int]] = None,
+    frames: int = config.IMAGE_ANIMATION_FRAMES,
+) -> list[PILImage]:
+    """
+    Decode up to `frames` evenly spaced frames of an animated GIF or WebP, scaling them down like `open_image`.
+
+    Frames can only be decoded one after another, so the time taken is capped by picking from no further into the
+    animation than `IMAGE_ANIMATION_MAX_PIXELS` pixels allow, no matter how many frames it has.
+
+    Raises:
+        ImageTooLargeError: The image would be decoded at more than `IMAGE_MAX_PIXELS` pixels.
+
+    Returns:
+        list[PILImage]: The frames, in RGBA if they have transparency and RGB otherwise. A single one for still
+            images.
+    """
+    return _prepare_frames(Image.open(BytesIO(data)), size, frames)
+
+
+def analyze_image(
+    data: bytes, *, size: Optional[tuple[int, int]] = ANALYSIS_SIZE
+) -> ImageAnalysis:
+    """
+    Decode an image and find its format, size and dominant color. Blocks, see `ImageService` to run it in a worker
+    process.
+
+    The dominant color of animated images is picked from a sample of their frames, see `open_frames`.
+
+    Args:
+        data (bytes): The encoded image.
+        size (Optional[tuple[int, int]]): The size to decode the image at, see `open_image`. The reported width and
+            height are always those of the original image.
+    """
+    start = time.perf_counter()
+    image = Image.open(BytesIO(data))
+    format, (width, height), mode = image.format, image.size, image.mode
+    frame_count = getattr(image, "n_frames", 1)
+    frames = _prepare_frames(image, size, config.IMAGE_ANIMATION_FRAMES)
+
+    decoded_at = time.perf_counter()
+    color = get_dominant_color(frames)
+
+    return ImageAnalysis(
+        format=format,
+        width=width,
+        height=height,
+        mode=mode,
+        frames=frame_count,
+        color=color,
+        decode_time=decoded_at - start,
+        analysis_time=time.perf_counter() - decoded_at,
+    )
+
+
+def _analyze_job(
+    payload: bytes | tuple[str, int], size: Optional[tuple[int, int]]
+) -> ImageAnalysis:
+    """Analyze an image passed as bytes or as the name and length of a shared memory block. Runs in a worker."""
+    if isinstance(payload, bytes):
+        return analyze_image(payload, size=size)
+
+    name, length = payload
+    shared = SharedMemory(name)
+    try:
+        with shared.buf[:length] as view:
+            data = bytes(view)
+    finally:
+        shared.close()
+
+    return analyze_image(data, size=size)
+
+
+def _source_url(source: "str | discord.Asset") -> str:
+    return source.url if isinstance(source, discord.Asset) else source
+
+
+def color_cache_key(source: "str | discord.Asset") -> Optional[str]:
+    """
+    Get the key the dominant color of an image is cached under without downloading it.
+
+    Only works for Discord assets and CDN URLs, whose content never changes. The format, size and other query
+    parameters are left out, they don't change the color.
 
     Returns:
-        PILImage: The image object.
+        Optional[str]: The key, or None if the image has to be downloaded and keyed by its digest instead.
     """
+    url = URL(_source_url(source))
+    if url.host not in DISCORD_CDN_HOSTS:
+        return None
+    return "discord:" + EXTENSION_RE.sub("", url.path)
+
+
+def sized_image_url(source: "str | discord.Asset", size: int) -> str:
+    """
+    Get the URL of an image at the smallest size the Discord CDN has that is at least `size` pixels wide and tall.
+
+    Static avatars, icons, emojis and the like are asked for as WebP, animated ones keep their format. Other URLs,
+    including Discord attachments, are returned as they are.
+    """
+    source_url = _source_url(source)
+    url = URL(source_url)
+    if url.host not in DISCORD_CDN_HOSTS or not DISCORD_RESIZABLE_PATH_RE.match(
+        url.path
+    ):
+        return source_url
+
+    if url.path.lower().endswith(DISCORD_STATIC_EXTENSIONS):
+        url = url.with_path(EXTENSION_RE.sub(".webp", url.path)).with_query(url.query)
+
+    cdn_size = next((s for s in DISCORD_CDN_SIZES if s >= size), DISCORD_CDN_SIZES[-1])
+    return str(url.update_query(size=cdn_size))
+
+
+def _digest_key(data: bytes) -> str:
+    return "sha256:" + hashlib.sha256(data).hexdigest()
+
+
+class ColorCache:
+    """
+    A cache for dominant colors, in an in-memory LRU and an SQLite database.
+
+    Attributes:
+        hits (int): Lookups answered from memory or the database.
+        misses (int): Lookups of colors that weren't cached.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_memory_entries: int = config.COLOR_CACHE_MEMORY_ENTRIES,
+        path: Optional[str] = config.COLOR_CACHE_PATH,
+    ) -> None:
+        self.max_memory_entries = max_memory_entries
+        self.path = path
+
+        self.hits = 0
+        self.misses = 0
 
-    image_data = await get_raw_content_data(image_url, *args, session=session, **kwargs)
-    return Image.open(BytesIO(image_data)).convert("RGBA")
+        self._memory: OrderedDict[str, tuple[int, int, int]] = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
 
+    def __len__(self) -> int:
+        return len(self._memory)
 
-def get_dominant_color(image: Image.Image) -> tuple[int, int, int]:
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            assert self.path is not None
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS dominant_colors ("
+                "key TEXT PRIMARY KEY, color INTEGER NOT NULL) WITHOUT ROWID"
+            )
+        return self._db
+
+    def _read_db(self, key: str) -> Optional[int]:
+        with self._db_lock:
+            row = (
+                self._connect()
+                .execute("SELECT color FROM dominant_colors WHERE key = ?", (key,))
+                .fetchone()
+            )
+        return row[0] if row else None
+
+    def _write_db(self, key: str, color: int) -> None:
+        with self._db_lock:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO dominant_colors (key, color) VALUES (?, ?)",
+                (key, color),
+            )
+            db.commit()
+
+    def _remember(self, key: str, color: tuple[int, int, int]) -> None:
+        self._memory[key] = color
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_memory(self, key: str) -> Optional[tuple[int, int, int]]:
+        """Get a color from memory only, without touching the database."""
+        color = self._memory.get(key)
+        if color is not None:
+            self._memory.move_to_end(key)
+        return color
+
+    async def get(self, key: str) -> Optional[tuple[int, int, int]]:
+        color = self.get_memory(key)
+        if color is None and self.path is not None:
+            value = await asyncio.to_thread(self._read_db, key)
+            if value is not None:
+                color = (value >> 16 & 0xFF, value >> 8 & 0xFF, value & 0xFF)
+                self._remember(key, color)
+
+        if color is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return color
+
+    async def put(self, key: str, color: tuple[int, int, int]) -> None:
+        self._remember(key, color)
+        if self.path is not None:
+            r, g, b = color
+            await asyncio.to_thread(self._write_db, key, r << 16 | g << 8 | b)
+
+    def close(self) -> None:
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+@dataclass
+class _Job:
+    data: bytes
+    size: Optional[tuple[int, int]]
+    future: "asyncio.Future[ImageAnalysis]"
+    queued_at: float
+    cost: int
+
+
+class ImageService:
+    """
+    Decodes and analyzes images in a pool of worker processes, keeping the work off the event loop.
+
+    Jobs wait in a bounded queue, callers wait for a free spot once it is full, and one dispatcher per worker hands
+    them to the pool. Images bigger than `shared_memory_threshold` bytes are handed over through shared memory
+    instead of being copied through the pool's pipes. The workers are started on the first job, and replaced when
+    one of them gets stuck on a job past `timeout` or dies.
+
+    Attributes:
+        timings (dict[str, LatencyHistogram]): How long jobs spent waiting in the queue (`wait`), being decoded
+            (`decode`) and analyzed (`analysis`), and from being queued until done (`total`).
+        completed (int): Jobs that finished.
+        failed (int): Jobs that raised or timed out.
+    """
+
+    def __init__(
+        self,
+        *,
+        workers: int = config.IMAGE_WORKERS,
+        queue_size: int = config.IMAGE_QUEUE_SIZE,
+        shared_memory_threshold: int = config.IMAGE_SHARED_MEMORY_THRESHOLD,
+        timeout: Optional[float] = config.IMAGE_JOB_TIMEOUT,
+        color_cache: Optional[ColorCache] = None,
+    ) -> None:
+        self.workers = workers
+        self.queue_size = queue_size
+        self.shared_memory_threshold = shared_memory_threshold
+        self.timeout = timeout
+        self.color_cache = color_cache
+
+        self.timings = {
+            phase: LatencyHistogram()
+            for phase in ("wait", "decode", "analysis", "total")
+        }
+        self.completed = 0
+        self.failed = 0
+        self.in_flight = 0
+
+        self._pool: Optional[ProcessPool] = None
+        self._queue: Optional[asyncio.Queue[_Job]] = None
+        self._dispatchers: list[asyncio.Task[None]] = []
+
+    @property
+    def running(self) -> bool:
+        return self._pool is not None
+
+    @property
+    def queue_depth(self) -> int:
+        """The amount of jobs waiting for a worker."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self) -> None:
+        """Start the workers. Must be called with an event loop running."""
+        if self._pool is not None:
+            return
+
+        self._pool = ProcessPool(self.workers, name="image job")
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._dispatchers = [
+            asyncio.create_task(self._dispatch()) for _ in range(self.workers)
+        ]
+
+    async def close(self) -> None:
+        """Stop the workers, cancelling the queued jobs. They are started again on the next job."""
+        for task in self._dispatchers:
+            task.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        self._dispatchers = []
+
+        if self._queue is not None:
+            while not self._queue.empty():
+                job = self._queue.get_nowait()
+                job.future.cancel()
+                _decode_budget.release(job.cost)
+            self._queue = None
+
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    async def analyze(
+        self, data: bytes, *, size: Optional[tuple[int, int]] = ANALYSIS_SIZE
+    ) -> ImageAnalysis:
+        """
+        Decode and analyze an image in a worker process, see `analyze_image`.
+
+        The image's header is checked first and its decode memory is reserved from the shared `DecodeBudget` until
+        the job is done.
+
+        Raises:
+            PIL.UnidentifiedImageError: The data is not an image Pillow can open.
+            ImageTooLargeError: The image would take more pixels or memory to decode than allowed.
+            asyncio.TimeoutError: The job took longer than `timeout` once a worker picked it up. The worker is killed
+                once the other jobs in its pool had the same time to finish, and its reservation is kept until then.
+        """
+        self.start()
+        assert self._queue is not None
+
+        # The reservation is released once a worker is done with the job, which can be after the caller stopped
+        # waiting for it
+        cost = decode_cost(data, size=size, frames=config.IMAGE_ANIMATION_FRAMES)
+        await _decode_budget.acquire(cost)
+        job = _Job(
+            data,
+            size,
+            asyncio.get_running_loop().create_future(),
+            time.perf_counter(),
+            cost,
+        )
+        try:
+            await self._queue.put(job)
+        except BaseException:
+            _decode_budget.release(cost)
+            raise
+
+        return await job.future
+
+    async def analyze_url(
+        self,
+        url: str,
+        *,
+        session: Optional[aiohttp.ClientSession] = None,
+        size: Optional[tuple[int, int]] = ANALYSIS_SIZE,
+        **kwargs,
+    ) -> ImageAnalysis:
+        """
+        Download an image with `get_raw_content_data` and analyze it in a worker process.
+
+        Discord CDN URLs are downloaded at the smallest size covering `size`, see `sized_image_url`.
+        """
+        if size is not None:
+            url = sized_image_url(url, max(size))
+        data = await get_raw_content_data(url, session, **kwargs)
+        return await self.analyze(data, size=size)
+
+    async def dominant_color(
+        self,
+        source: "str | discord.Asset",
+        *,
+        session: Optional[aiohttp.ClientSession] = None,
+        **kwargs,
+    ) -> tuple[int, int, int]:
+        """
+        Get the dominant color of an image by URL or Discord asset, going through `color_cache` if set.
+
+        Colors of Discord assets are looked up before downloading, see `color_cache_key`, and only downloaded at the
+        size the color is picked at. Other images are downloaded and looked up by the digest of their bytes.
+        """
+        return await self._dominant_color(
+            _source_url(source), session=session, downloads=None, **kwargs
+        )
+
+    async def dominant_colors(
+        self,
+        sources: "Iterable[str | discord.Asset]",
+        *,
+        session: Optional[aiohttp.ClientSession] = None,
+        max_downloads: int = config.IMAGE_BATCH_DOWNLOADS,
+        **kwargs,
+    ) -> AsyncIterator[ColorResult]:
+        """
+        Get the dominant colors of many images at once, see `dominant_color`.
+
+        Sources pointing at the same image are only looked up once. Cached colors come back right away, the other
+        images are downloaded at most `max_downloads` at a time and analyzed in the worker processes.
+
+        Yields:
+            ColorResult: The color of every source, in the order they finished. Sources that failed have an `error`
+                instead, the rest of the batch carries on.
+        """
+        groups: dict[str, list[str | discord.Asset]] = {}
+        for source in sources:
+            url = _source_url(source)
+            groups.setdefault(color_cache_key(url) or url, []).append(source)
+
+        downloads = asyncio.Semaphore(max_downloads)
+
+        async def run(
+            group: list[str | discord.Asset],
+        ) -> tuple[list[str | discord.Asset], ColorResult]:
+            try:
+                color = await self._dominant_color(
+                    _source_url(group[0]),
+                    session=session,
+                    downloads=downloads,
+                    **kwargs,
+                )
+            except Exception as e:
+                return group, ColorResult(group[0], None, e)
+            return group, ColorResult(group[0], color)
+
+        tasks = [asyncio.create_task(run(group)) for group in groups.values()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                group, result = await next_done
+                for source in group:
+                    yield ColorResult(source, result.color, result.error)
+
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _dominant_color(
+        self,
+        url: str,
+        *,
+        session: Optional[aiohttp.ClientSession],
+        downloads: Optional[asyncio.Semaphore],
+        **kwargs,
+    ) -> tuple[int, int, int]:
+        key = color_cache_key(url)
+
+        if self.color_cache is not None and key is not None:
+            color = await self.color_cache.get(key)
+            if color is not None:
+                return color
+
+        # The color is picked from a sample of this size anyway
+        url = sized_image_url(url, DOMINANT_COLOR_SAMPLE_SIZE)
+        if downloads is None:
+            data = await get_raw_content_data(url, session, **kwargs)
+        else:
+            async with downloads:
+                data = await get_raw_content_data(url, session, **kwargs)
+
+        if self.color_cache is not None and key is None:
+            key = _digest_key(data)
+            color = await self.color_cache.get(key)
+            if color is not None:
+                return color
+
+        color = (await self.analyze(data)).color
+        if self.color_cache is not None and key is not None:
+            await self.color_cache.put(key, color)
+        return color
+
+    async def _dispatch(self) -> None:
+        assert self._queue is not None
+
+        while True:
+            job = await self._queue.get()
+            # The caller stopped waiting while the job was queued
+            if job.future.done():
+                _decode_budget.release(job.cost)
+                continue
+
+            self.timings["wait"].observe(time.perf_counter() - job.queued_at)
+            self.in_flight += 1
+            assert self._pool is not None
+            shared: Optional[SharedMemory] = None
+            submitted = False
+            try:
+                payload: bytes | tuple[str, int] = job.data
+                if len(job.data) > self.shared_memory_threshold:
+                    shared = SharedMemory(create=True, size=len(job.data))
+                    shared.buf[: len(job.data)] = job.data
+                    payload = (shared.name, len(job.data))
+
+                submitted = True
+                # The worker may still be reading the shared memory after we stop waiting for it
+                result = await self._pool.run(
+                    _analyze_job,
+                    payload,
+                    job.size,
+                    timeout=self.timeout,
+                    on_done=lambda job=job, shared=shared: self._release_job(
+                        job, shared
+                    ),
+                )
+            except asyncio.CancelledError:
+                job.future.cancel()
+                raise
+            except Exception as e:
+                self.failed += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                self.completed += 1
+                self.timings["decode"].observe(result.decode_time)
+                self.timings["analysis"].observe(result.analysis_time)
+                self.timings["total"].observe(time.perf_counter() - job.queued_at)
+                if not job.future.done():
+                    job.future.set_result(result)
+            finally:
+                if not submitted:
+                    self._release_job(job, shared)
+
+    def _release_job(self, job: _Job, shared: Optional[SharedMemory]) -> None:
+        self.in_flight -= 1
+        _decode_budget.release(job.cost)
+        if shared is not None:
+            shared.close()
+            shared.unlink()
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "decode_budget": {
+                "limit": _decode_budget.limit,
+                "in_use": _decode_budget.in_use,
+                "waiting": _decode_budget.waiting,
+            },
+            "color_cache": (
+                None
+                if self.color_cache is None
+                else {
+                    "entries": len(self.color_cache),
+                    "hits": self.color_cache.hits,
+                    "misses": self.color_cache.misses,
+                }
+            ),
+            **{phase: histogram.to_dict() for phase, histogram in self.timings.items()},
+        }
+
+
+def _sample_pixels(
+    image: "Image.Image | Sequence[Image.Image]", sample_size: Optional[int]
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Sample an image down to fit in `sample_size` and split it into its channels and the brightness of every pixel.
+
+    The pixels of the frames of an animation are sampled one by one and pooled together.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: The red, green and blue channels and the brightness
+            (0-255) of every pixel, transparent pixels get a brightness of 256.
+    """
+    if not isinstance(image, Image.Image):
+        channels = zip(*(_sample_pixels(frame, sample_size) for frame in image))
+        r, g, b, brightness = (np.concatenate(channel) for channel in channels)
+        return r, g, b, brightness
+
+    if sample_size is not None and max(image.size) > sample_size:
+        scale = sample_size / max(image.size)
+        # Nearest neighbour keeps the colors as they are instead of blending them into new ones
+        image = image.resize(
+            (max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+            Image.Resampling.NEAREST,
+        )
+
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA")
+
+    # Flatten the image into one array per channel
+    pixels = np.asarray(image).reshape(-1, len(image.mode))
+    r, g, b = (pixels[:, i].astype(np.uint16) for i in range(3))
+
+    # Calculate brightness (0-255) for each pixel using luminance (perceptual model)
+    brightness = (r * LUMINANCE[0] + g * LUMINANCE[1] + b * LUMINANCE[2]) >> 8
+
+    # Mask out transparent pixels (alpha channel == 0) by giving them a brightness past the histogram
+    if image.mode == "RGBA":
+        brightness[pixels[:, 3] == 0] = 256
+
+    return r, g, b, brightness
+
+
+def _bright_pixels(brightness: np.ndarray) -> np.ndarray:
+    """Get the indices of the top 25% brightest pixels that aren't transparent."""
+    levels = np.bincount(brightness, minlength=257)[:256]
+    count = int(levels.sum())
+    if count == 0:
+        return np.empty(0, dtype=np.intp)
+
+    # Keep the pixels above the 75th percentile brightness. If every pixel is equally bright, keep them all
+    threshold = min(
+        np.searchsorted(np.cumsum(levels), count * 0.75, side="right"),
+        np.flatnonzero(levels)[-1],
+    )
+    return np.flatnonzero((brightness >= threshold) & (brightness <= 255))
+
+
+def _color_bins(r: np.ndarray, g: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Quantize colors into the bins of a histogram of HISTOGRAM_BITS bits per channel."""
+    shift = 8 - HISTOGRAM_BITS
+    return (
+        (r >> shift) << (2 * HISTOGRAM_BITS)
+        | (g >> shift) << HISTOGRAM_BITS
+        | (b >> shift)
+    )
+
+
+def get_dominant_color(
+    image: "Image.Image | Sequence[Image.Image]",
+    *,
+    sample_size: Optional[int] = DOMINANT_COLOR_SAMPLE_SIZE,
+) -> tuple[int, int, int]:
     """
     Processes a PIL Image object and extracts the most bright and dominant color
     from the entire image, excluding transparent pixels.
 
+    The brightest quarter of the pixels is quantized into a color histogram, the fullest bin is picked and refined to
+    the average of the pixels in and right around it.
+
     Args:
-        image (Image.Image): A PIL Image object to process.
+        image (Image.Image | Sequence[Image.Image]): A PIL Image object to process, or frames of an animation to
+            process together, see `open_frames`.
+        sample_size (Optional[int]): Images wider or taller than this are sampled down to fit in a square of this
+            size first, so big images cost about as much as small ones. None to look at every pixel.
 
     Returns:
         Tuple[int, int, int]: The RGB values of the bright and dominant color.
     """
-    # Convert the image to a numpy array
-    pixels = np.array(image)
-
-    # Mask out transparent pixels (alpha channel == 0)
-    if pixels.shape[-1] == 4:  # Check if image has an alpha channel
-        non_transparent_pixels = pixels[
-            pixels[..., 3] > 0
-        ]  # Keep non-transparent pixels
-    else:
-        non_transparent_pixels = (
-            pixels  # Assume all pixels are non-transparent if no alpha channel
-        )
+    r, g, b, brightness = _sample_pixels(image, sample_size)
+    bright = _bright_pixels(brightness)
 
     # If there are no non-transparent pixels, return a default value (e.g., white)
-    if non_transparent_pixels.shape[0] == 0:
-        return (255, 255, 255)  # Default to white if no non-transparent pixels
-
-    # Convert RGBA to RGB (remove alpha channel) and reshape the array for clustering
-    pixels_rgb = non_transparent_pixels[..., :3].reshape(-1, 3)
-
-    # Calculate brightness for each pixel using luminance (perceptual model)
-    # Luminance formula: 0.2126*R + 0.7152*G + 0.0722*B
-    brightness = (
-        0.2126 * pixels_rgb[:, 0]
-        + 0.7152 * pixels_rgb[:, 1]
-        + 0.0722 * pixels_rgb[:, 2]
-    )
+    if bright.size == 0:
+        return (255, 255, 255)
+
+    r, g, b = r[bright], g[bright], b[bright]
+
+    # Quantize the bright pixels into a histogram and find the fullest bin
+    bins = _color_bins(r, g, b)
+    shape = (1 << HISTOGRAM_BITS,) * 3
+    counts = np.bincount(bins, minlength=np.prod(shape)).reshape(shape)
+    peak = np.unravel_index(counts.argmax(), shape)
 
-    # Filter to keep the top 25% brightest pixels for clustering
-    threshold = np.percentile(brightness, 75)  # 75th percentile brightness
-    bright_pixels = pixels_rgb[brightness >= threshold]
+    # Refine the bin to the average of its pixels and those of the bins right next to it, so a color sitting on the
+    # edge of two bins isn't cut in half
+    near_bins = np.zeros(shape, dtype=bool)
+    near_bins[tuple(slice(max(0, i - 1), i + 2) for i in peak)] = True
+    near = np.flatnonzero(near_bins.reshape(-1)[bins])
 
-    # If there are no bright pixels, fall back to clustering all pixels
-    if bright_pixels.shape[0] == 0:
-        bright_pixels = pixels_rgb
+    return (int(r[near].mean()), int(g[near].mean()), int(b[near].mean()))
 
-    # Apply KMeans to find the most prominent bright color
-    kmeans = KMeans(n_clusters=1, random_state=0)
-    kmeans.fit(bright_pixels)
 
-    if TYPE_CHECKING:  # epic gaslighting right here
-        dominant_color: tuple[int, int, int] = (0, 0, 0)
+def get_palette(
+    image: "Image.Image | Sequence[Image.Image]",
+    k: int = 5,
+    *,
+    sample_size: Optional[int] = DOMINANT_COLOR_SAMPLE_SIZE,
+    bright_only: bool = False,
+) -> list[PaletteColor]:
+    """
+    Extract a palette of up to `k` colors from an image, excluding transparent pixels.
+
+    The pixels are quantized into the same color histogram as `get_dominant_color`. The `k` fullest bins that are at
+    least PALETTE_SEPARATION bins apart are picked, then every pixel goes to the nearest of them and each color is
+    refined to the average of its pixels. The work is bounded by the sample size and `k`, never by the image.
+
+    Args:
+        image (Image.Image | Sequence[Image.Image]): A PIL Image object to process, or frames of an animation to
+            process together.
+        k (int): The most colors to return, fewer are returned if the image doesn't have that many distinct ones.
+        sample_size (Optional[int]): Images wider or taller than this are sampled down to fit in a square of this
+            size first, see `get_dominant_color`.
+        bright_only (bool): Only look at the brightest quarter of the pixels, like `get_dominant_color` does.
+
+    Raises:
+        ValueError: `k` is less than 1.
+
+    Returns:
+        list[PaletteColor]: The colors and the share of the pixels looked at closest to them, fullest first. White
+            with a share of 1 if the image is fully transparent.
+    """
+    if k < 1:
+        raise ValueError("k must be at least 1")
+
+    r, g, b, brightness = _sample_pixels(image, sample_size)
+    if bright_only:
+        selected = _bright_pixels(brightness)
     else:
-        dominant_color = tuple(
-            map(int, kmeans.cluster_centers_[0])
-        )  # Get the dominant color and convert it into integers
+        selected = np.flatnonzero(brightness <= 255)
+
+    if selected.size == 0:
+        return [PaletteColor((255, 255, 255), 1.0)]
+
+    r, g, b = r[selected], g[selected], b[selected]
+
+    shape = (1 << HISTOGRAM_BITS,) * 3
+    counts = np.bincount(_color_bins(r, g, b), minlength=np.prod(shape)).reshape(shape)
 
-    return dominant_color
+    # Take the fullest bins, clearing the ones around every pick so the colors don't all come from the same area
+    peaks = []
+    for _ in range(k):
+        peak = np.unravel_index(counts.argmax(), shape)
+        if counts[peak] == 0:
+            break
+        peaks.append(peak)
+        counts[
+            tuple(
+                slice(max(0, i - PALETTE_SEPARATION), i + PALETTE_SEPARATION + 1)
+                for i in peak
+            )
+        ] = 0
+
+    # Give every pixel to the palette color whose bin center is nearest
+    shift = 8 - HISTOGRAM_BITS
+    centers = (np.array(peaks, dtype=np.int32) << shift) + (1 << shift >> 1)
+    pixels = np.stack((r, g, b), axis=1).astype(np.int32)
+    distances = ((pixels[:, np.newaxis, :] - centers[np.newaxis, :, :]) ** 2).sum(2)
+    nearest = distances.argmin(axis=1)
+
+    sizes = np.bincount(nearest, minlength=len(peaks))
+    sums = [np.bincount(nearest, weights=c, minlength=len(peaks)) for c in (r, g, b)]
+
+    palette = [
+        PaletteColor(
+            (int(sums[0][i] / size), int(sums[1][i] / size), int(sums[2][i] / size)),
+            size / selected.size,
+        )
+        for i, size in enumerate(sizes.tolist())
+        if size
+    ]
+    palette.sort(key=lambda color: color.share, reverse=True)
+    return palette
@@ -1,17 +1,64 @@
+import os
+import json
+import time
+import email.utils
+import asyncio
+import hashlib
+import shutil
+import tempfile
+import threading
 import traceback
-from typing import Optional
-from dataclasses import dataclass
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Coroutine,
+    Generic,
+    Hashable,
+    Optional,
+    TypeVar,
+)
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, asdict
+
+from .. import config
+from .logger import get_logger
+from .http_policies import get_host_policy
+from .webpages import decode_html, html_to_markdown
 
 import aiohttp
-from markdownify import markdownify
+from yarl import URL
 
 __all__ = (
+    "ContentTooLargeError",
     "SearchResult",
+    "CachedResponse",
+    "HTTPCache",
+    "SingleFlight",
+    "create_session",
+    "get_default_session",
+    "set_default_session",
+    "http_get",
+    "iter_response",
+    "is_cacheable",
+    "get_default_cache",
+    "set_default_cache",
+    "stream_content",
+    "download_to_file",
     "get_raw_content_data",
     "read_website",
+    "iter_search_web",
     "search_web",
+    "WebDocument",
+    "research_web",
 )
 
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
 
 @dataclass
 class SearchResult:
@@ -23,45 +70,860 @@ class SearchResult:
     score: float
 
 
-async def ensure_session(
+@dataclass
+class WebDocument:
+    result: SearchResult
+    markdown: str
+    elapsed: float
+
+
+class ContentTooLargeError(aiohttp.ClientError):
+    """Raised when a response body is larger than the allowed download size."""
+
+    def __init__(self, url: str, max_size: int) -> None:
+        super().__init__(f"response from {url} is larger than {max_size} bytes")
+        self.url = url
+        self.max_size = max_size
+
+
+async def iter_response(
+    response: aiohttp.ClientResponse,
+    *,
+    max_size: Optional[int],
+    chunk_size: int = config.HTTP_CHUNK_SIZE,
+) -> AsyncIterator[bytes]:
+    """
+    Iterate over the body of a response in chunks as they arrive.
+
+    Args:
+        response (aiohttp.ClientResponse): The response to read, for example from `http_get`.
+        max_size (Optional[int]): The maximum size of the body in bytes, None for no limit.
+        chunk_size (int): The maximum size of each chunk in bytes.
+
+    Raises:
+        ContentTooLargeError: The body is larger than `max_size`, according to `Content-Length` or while streaming.
+
+    Yields:
+        bytes: The chunks of the body.
+    """
+    url = str(response.url)
+
+    # Refuse up front if the server already told us it's too big
+    if (
+        max_size is not None
+        and response.content_length is not None
+        and response.content_length > max_size
+    ):
+        raise ContentTooLargeError(url, max_size)
+
+    received = 0
+    async for chunk in response.content.iter_chunked(chunk_size):
+        received += len(chunk)
+        if max_size is not None and received > max_size:
+            raise ContentTooLargeError(url, max_size)
+        yield chunk
+
+
+async def _read_response(
+    response: aiohttp.ClientResponse, *, max_size: Optional[int]
+) -> bytes:
+    chunks = [chunk async for chunk in iter_response(response, max_size=max_size)]
+    return b"".join(chunks)
+
+
+@dataclass
+class CachedResponse:
+    url: str
+    status: int
+    headers: dict[str, str]
+    body: bytes
+    stored_at: float
+    expires_at: float
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    @property
+    def content_type(self) -> Optional[str]:
+        return self.headers.get("Content-Type")
+
+
+# Response headers worth keeping around with a cached body
+CACHED_HEADERS = (
+    "Content-Type",
+    "Cache-Control",
+    "Expires",
+    "ETag",
+    "Last-Modified",
+    "Date",
+)
+
+
+def _cached_headers(headers: Any) -> dict[str, str]:
+    return {name: headers[name] for name in CACHED_HEADERS if name in headers}
+
+
+def _parse_cache_control(value: str) -> dict[str, Optional[str]]:
+    directives: dict[str, Optional[str]] = {}
+    for part in value.split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') if argument else None
+    return directives
+
+
+def _freshness_lifetime(headers: dict[str, str]) -> Optional[float]:
+    """
+    Get how many seconds a response can be served from the cache without revalidating.
+
+    Returns None if the response must not be stored at all.
+    """
+    directives = _parse_cache_control(headers.get("Cache-Control", ""))
+
+    if "no-store" in directives:
+        return None
+
+    if "no-cache" in directives:
+        lifetime = 0.0
+
+    elif "max-age" in directives:
+        try:
+            lifetime = max(0.0, float(directives["max-age"] or 0))
+        except ValueError:
+            lifetime = 0.0
+
+    elif "Expires" in headers:
+        try:
+            expires = email.utils.parsedate_to_datetime(headers["Expires"])
+            date = (
+                email.utils.parsedate_to_datetime(headers["Date"])
+                if "Date" in headers
+                else None
+            )
+            now = date.timestamp() if date else time.time()
+            lifetime = max(0.0, expires.timestamp() - now)
+        except (TypeError, ValueError):
+            # An invalid Expires value means it has already expired
+            lifetime = 0.0
+
+    else:
+        lifetime = 0.0
+
+    # Storing a response that is stale right away is only useful if it can be revalidated
+    if lifetime == 0 and "ETag" not in headers and "Last-Modified" not in headers:
+        return None
+
+    return lifetime
+
+
+class HTTPCache:
+    """
+    A two-tier cache for HTTP GET responses.
+
+    Responses are kept in memory in an LRU bounded by the total size of the bodies, and in a folder on disk where
+    every body is stored in its own file next to a JSON file with its headers. `Cache-Control` and `Expires` decide
+    how long a response stays fresh, and stale responses are revalidated with `If-None-Match` / `If-Modified-Since`
+    when they have an `ETag` or `Last-Modified` header.
+
+    Attributes:
+        hits (int): Requests served from the cache without touching the network.
+        misses (int): Requests that had to download the body.
+        revalidations (int): Stale responses the server confirmed were still valid (304 Not Modified).
+    """
+
+    def __init__(
+        self,
+        *,
+        max_memory_bytes: int = config.HTTP_CACHE_MEMORY_SIZE,
+        folder: Optional[str] = config.HTTP_CACHE_FOLDER,
+        max_disk_bytes: int = config.HTTP_CACHE_DISK_SIZE,
+    ) -> None:
+        self.max_memory_bytes = max_memory_bytes
+        self.folder = folder
+        self.max_disk_bytes = max_disk_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+        self._memory: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes: Optional[int] = None
+        # Disk writes run in threads, this guards `_disk_bytes`, replacing entries and evicting them
+        self._disk_lock = threading.Lock()
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._memory_bytes
+
+    @staticmethod
+    def _host(url: str) -> str:
+        return URL(url).host or "_"
+
+    @staticmethod
+    def _digest(url: str) -> str:
+        return hashlib.sha256(url.encode()).hexdigest()
+
+    def _paths(self, url: str) -> tuple[str, str]:
+        assert self.folder is not None
+        base = os.path.join(self.folder, self._host(url), self._digest(url))
+        return base + ".json", base + ".body"
+
+    def _remember(self, response: CachedResponse) -> None:
+        self._forget(response.url)
+
+        size = len(response.body)
+        if size > self.max_memory_bytes:
+            return
+
+        self._memory[response.url] = response
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted.body)
+
+    def _forget(self, url: str) -> None:
+        response = self._memory.pop(url, None)
+        if response is not None:
+            self._memory_bytes -= len(response.body)
+
+    def _read_disk(self, url: str) -> Optional[CachedResponse]:
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, "rb") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+
+        if meta.get("url") != url:  # sha256 collision or a corrupt file
+            return None
+        return CachedResponse(body=body, **meta)
+
+    def _disk_usage(self) -> int:
+        if self._disk_bytes is None:
+            assert self.folder is not None
+            self._disk_bytes = 0
+            for root, _, files in os.walk(self.folder):
+                for name in files:
+                    # Temporary files are counted once they replace an entry
+                    if name.endswith(".tmp"):
+                        continue
+                    try:
+                        self._disk_bytes += os.path.getsize(os.path.join(root, name))
+                    except OSError:
+                        pass
+        return self._disk_bytes
+
+    def _evict_disk(self) -> None:
+        assert self.folder is not None
+        bodies = []
+        for root, _, files in os.walk(self.folder):
+            for name in files:
+                if name.endswith(".body"):
+                    path = os.path.join(root, name)
+                    try:
+                        bodies.append((os.path.getmtime(path), path))
+                    except OSError:
+                        pass
+
+        # Drop the least recently stored bodies until we are under 90% of the limit
+        bodies.sort()
+        for _, body_path in bodies:
+            if self._disk_usage() <= self.max_disk_bytes * 0.9:
+                break
+            for path in (body_path, body_path[: -len(".body")] + ".json"):
+                try:
+                    size = os.path.getsize(path)
+                    os.remove(path)
+                except OSError:
+                    continue
+                self._disk_bytes = self._disk_usage() - size
+
+    @staticmethod
+    def _write_temporary(folder: str, data: bytes) -> str:
+        fd, path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+        except BaseException:
+            os.remove(path)
+            raise
+        return path
+
+    def _write_disk(self, response: CachedResponse) -> None:
+        meta_path, body_path = self._paths(response.url)
+        folder = os.path.dirname(meta_path)
+        os.makedirs(folder, exist_ok=True)
+
+        meta = asdict(response)
+        del meta["body"]
+        encoded_meta = json.dumps(meta).encode()
+
+        # Write to temporary files of our own first so that readers never see half-written entries and concurrent
+        # writes of the same URL don't clobber each other
+        written: list[tuple[str, str]] = []
+        try:
+            for path, data in ((body_path, response.body), (meta_path, encoded_meta)):
+                written.append((self._write_temporary(folder, data), path))
+
+            with self._disk_lock:
+                usage = self._disk_usage()
+                previous = 0
+                for path in (meta_path, body_path):
+                    try:
+                        previous += os.path.getsize(path)
+                    except OSError:
+                        pass
+
+                for temporary, path in written:
+                    os.replace(temporary, path)
+                written.clear()
+
+                self._disk_bytes = (
+                    usage - previous + len(response.body) + len(encoded_meta)
+                )
+                if self._disk_usage() > self.max_disk_bytes:
+                    self._evict_disk()
+        finally:
+            for temporary, _ in written:
+                try:
+                    os.remove(temporary)
+                except OSError:
+                    pass
+
+    def _remove_disk(self, folder: str) -> None:
+        with self._disk_lock:
+            shutil.rmtree(folder, True)
+            self._disk_bytes = None
+
+    async def get(self, url: str) -> Optional[CachedResponse]:
+        """Get a cached response, fresh or stale, checking memory first and disk second."""
+        response = self._memory.get(url)
+        if response is not None:
+            self._memory.move_to_end(url)
+            return response
+
+        if self.folder is None:
+            return None
+
+        response = await asyncio.to_thread(self._read_disk, url)
+        if response is not None:
+            self._remember(response)
+        return response
+
+    async def put(self, response: CachedResponse) -> None:
+        """Store a response in both tiers. Failing to write it to disk is logged, not raised."""
+        self._remember(response)
+        if self.folder is not None:
+            try:
+                await asyncio.to_thread(self._write_disk, response)
+            except OSError as e:
+                logger.warning(f"couldn't cache {response.url} on disk: {e}")
+
+    async def purge(self, host: str) -> int:
+        """Remove every cached response for a host. Returns how many were removed from memory."""
+        host = host.lower()
+        urls = [url for url in self._memory if self._host(url) == host]
+        for url in urls:
+            self._forget(url)
+
+        if self.folder is not None:
+            await asyncio.to_thread(self._remove_disk, os.path.join(self.folder, host))
+
+        return len(urls)
+
+    async def clear(self) -> None:
+        """Remove every cached response."""
+        self._memory.clear()
+        self._memory_bytes = 0
+
+        if self.folder is not None:
+            await asyncio.to_thread(self._remove_disk, self.folder)
+
+    async def fetch(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        *,
+        raise_for_status: bool = False,
+        max_size: Optional[int] = config.HTTP_MAX_DOWNLOAD_SIZE,
+        **kwargs: Any,
+    ) -> CachedResponse:
+        """
+        GET a URL through the cache.
+
+        Fresh responses are returned without a request. Stale responses with validators are revalidated, and
+        everything else is downloaded and stored if the response allows it.
+        """
+        cached = await self.get(url)
+        if cached is not None and cached.fresh:
+            self.hits += 1
+            return cached
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        if cached is not None:
+            if "ETag" in cached.headers:
+                headers["If-None-Match"] = cached.headers["ETag"]
+            if "Last-Modified" in cached.headers:
+                headers["If-Modified-Since"] = cached.headers["Last-Modified"]
+
+        async with http_get(session, url, headers=headers, **kwargs) as response:
+            if cached is not None and response.status == 304:
+                self.revalidations += 1
+                cached.headers.update(_cached_headers(response.headers))
+                lifetime = _freshness_lifetime(cached.headers)
+                if lifetime is None:
+                    self._forget(url)
+                else:
+                    cached.stored_at = time.time()
+                    cached.expires_at = cached.stored_at + lifetime
+                    await self.put(cached)
+                return cached
+
+            if raise_for_status:
+                response.raise_for_status()
+
+            body = await _read_response(response, max_size=max_size)
+            return await self.store(url, response, body)
+
+    async def get_fresh(self, url: str) -> Optional[CachedResponse]:
+        """Get a cached response only if it is still fresh, counting it as a hit."""
+        cached = await self.get(url)
+        if cached is None or not cached.fresh:
+            return None
+
+        self.hits += 1
+        return cached
+
+    async def store(
+        self, url: str, response: aiohttp.ClientResponse, body: bytes
+    ) -> CachedResponse:
+        """
+        Wrap a body downloaded outside of `fetch`, counting it as a miss, and cache it if the response allows it.
+        """
+        self.misses += 1
+
+        result = CachedResponse(
+            url=url,
+            status=response.status,
+            headers=_cached_headers(response.headers),
+            body=body,
+            stored_at=time.time(),
+            expires_at=0,
+        )
+
+        vary = response.headers.get("Vary", "").lower().replace(" ", "")
+        lifetime = _freshness_lifetime(result.headers)
+        if (
+            response.status == 200
+            and lifetime is not None
+            and vary in ("", "accept-encoding")
+        ):
+            result.expires_at = result.stored_at + lifetime
+            await self.put(result)
+
+        return result
+
+
+_default_cache: Optional[HTTPCache] = None
+
+
+def get_default_cache() -> Optional[HTTPCache]:
+    """Get the cache used by the internet utils when caching is enabled, if one was set."""
+    return _default_cache
+
+
+def set_default_cache(cache: Optional[HTTPCache]) -> None:
+    """Set the cache used by the internet utils when caching is enabled. The bot sets this to its own cache."""
+    global _default_cache
+    _default_cache = cache
+
+
+def is_cacheable(kwargs: dict[str, Any]) -> bool:
+    """Whether a GET request with these keyword arguments can be shared through the cache."""
+    if not set(kwargs) <= {"headers", "timeout", "allow_redirects"}:
+        return False
+    headers = {k.lower() for k in kwargs.get("headers") or {}}
+    return not headers & {"authorization", "cookie", "range"}
+
+
+@asynccontextmanager
+async def http_get(
+    session: aiohttp.ClientSession, url: str, **kwargs: Any
+) -> AsyncIterator[aiohttp.ClientResponse]:
+    """
+    GET a URL through the `HostPolicy` of its host.
+
+    Waits for the host's rate limit and concurrency cap, fails fast with `CircuitOpenError` while the host is failing
+    and feeds errors, timeouts and 5xx responses back into its circuit breaker. Keyword arguments are passed on to
+    `session.get`.
+    """
+    policy = get_host_policy(URL(url).host or "")
+    async with policy.request() as attempt:
+        async with session.get(
+            url, ssl=True if url.lower().startswith("https") else False, **kwargs
+        ) as response:
+            if response.status >= 500:
+                attempt.fail()
+            yield response
+
+
+class _Flight(Generic[T]):
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task[T]") -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight(Generic[T]):
+    """
+    Coalesces identical concurrent calls into one.
+
+    While a call for a key is in flight, later calls with the same key wait for its result instead of starting their
+    own, and every waiter gets the very same result object. Cancelling a waiter only cancels the shared call once no
+    other waiter is left.
+
+    Examples:
+        >>> flights = SingleFlight()
+        >>> await flights.run(("GET", url), lambda: download(url))
+    """
+
+    def __init__(self) -> None:
+        self._flights: dict[Hashable, _Flight[T]] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def run(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        """Await `call()`, or the call already in flight for `key`."""
+        flight = self._flights.get(key)
+        if flight is None:
+
+            async def run_call() -> T:
+                return await call()
+
+            flight = _Flight(asyncio.create_task(run_call()))
+            self._flights[key] = flight
+
+            def forget(_: "asyncio.Task[T]", flight: _Flight[T] = flight) -> None:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+            flight.task.add_done_callback(forget)
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                # Callers arriving while the task winds down must start a new call, not join the cancelled one
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+
+_flights: SingleFlight[bytes] = SingleFlight()
+
+
+_default_session: Optional[aiohttp.ClientSession] = None
+
+
+def create_session(**kwargs) -> aiohttp.ClientSession:
+    """
+    Create a long-lived aiohttp.ClientSession with a pooled connector.
+
+    Connections are kept alive and reused, DNS lookups are cached and the amount of connections (in total and per
+    host) is capped, using the `HTTP_*` values in the config. Must be called with an event loop running. Any keyword
+    arguments are passed on to aiohttp.ClientSession.
+
+    Returns:
+        aiohttp.ClientSession: The session. The caller is responsible for closing it.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=config.HTTP_MAX_CONNECTIONS,
+        limit_per_host=config.HTTP_MAX_CONNECTIONS_PER_HOST,
+        ttl_dns_cache=config.HTTP_DNS_CACHE_TTL,
+        keepalive_timeout=config.HTTP_KEEPALIVE_TIMEOUT,
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=config.HTTP_TIMEOUT, connect=config.HTTP_CONNECT_TIMEOUT
+    )
+    kwargs.setdefault("connector", connector)
+    kwargs.setdefault("timeout", timeout)
+    return aiohttp.ClientSession(**kwargs)
+
+
+def get_default_session() -> Optional[aiohttp.ClientSession]:
+    """Get the session used by the internet utils when no session is passed, if one was set."""
+    return _default_session
+
+
+def set_default_session(session: Optional[aiohttp.ClientSession]) -> None:
+    """Set the session used by the internet utils when no session is passed. The bot sets this to its own session."""
+    global _default_session
+    _default_session = session
+
+
+def ensure_session(
     session: Optional[aiohttp.ClientSession] = None,
 ) -> aiohttp.ClientSession:
-    """Ensures that an aiohttp.ClientSession is returned."""
-    if session is None:
-        async with aiohttp.ClientSession() as session:
-            return session
-    return session
+    """
+    Ensures that an open aiohttp.ClientSession is returned.
+
+    Falls back to the default session, creating a pooled one with `create_session` if no default session is set or
+    the default session was closed.
+    """
+    if session is not None:
+        return session
+
+    if _default_session is None or _default_session.closed:
+        set_default_session(create_session())
+
+    assert _default_session is not None
+    return _default_session
+
+
+async def stream_content(
+    url: str,
+    *,
+    session: Optional[aiohttp.ClientSession] = None,
+    max_size: Optional[int] = config.HTTP_MAX_DOWNLOAD_SIZE,
+    chunk_size: int = config.HTTP_CHUNK_SIZE,
+    **kwargs,
+) -> AsyncIterator[bytes]:
+    """
+    Download content in chunks as they arrive.
+
+    The connection is held until the iterator is exhausted or closed, so use it with `async for` or
+    `contextlib.aclosing`.
+
+    Args:
+        url (str): The URL to download.
+        session (Optional[aiohttp.ClientSession]): The session to use. Defaults to the default session.
+        max_size (Optional[int]): The maximum size of the body in bytes, None for no limit. Defaults to
+            `HTTP_MAX_DOWNLOAD_SIZE`.
+        chunk_size (int): The maximum size of each chunk in bytes.
+
+    Raises:
+        ContentTooLargeError: The body is larger than `max_size`, according to `Content-Length` or while streaming.
+
+    Yields:
+        bytes: The chunks of the body.
+    """
+    session = ensure_session(session)
+
+    async with http_get(session, url, **kwargs) as response:
+        async for chunk in iter_response(
+            response, max_size=max_size, chunk_size=chunk_size
+        ):
+            yield chunk
+
+
+async def download_to_file(
+    url: str,
+    *,
+    session: Optional[aiohttp.ClientSession] = None,
+    max_size: Optional[int] = config.HTTP_MAX_DOWNLOAD_SIZE,
+    spool_threshold: int = config.HTTP_SPOOL_THRESHOLD,
+    **kwargs,
+) -> tempfile.SpooledTemporaryFile:
+    """
+    Download content into a temporary file that is kept in memory until it grows past `spool_threshold` bytes.
+
+    The returned file is positioned at the start. The caller is responsible for closing it, which deletes it.
+
+    Raises:
+        ContentTooLargeError: The body is larger than `max_size`.
+    """
+    file = tempfile.SpooledTemporaryFile(max_size=spool_threshold)
+    try:
+        async for chunk in stream_content(
+            url, session=session, max_size=max_size, **kwargs
+        ):
+            file.write(chunk)
+    except BaseException:
+        file.close()
+        raise
+
+    file.seek(0)
+    return file
 
 
 async def get_raw_content_data(
-    url: str, session: Optional[aiohttp.ClientSession] = None, **kwargs
+    url: str,
+    session: Optional[aiohttp.ClientSession] = None,
+    *,
+    cache: bool = True,
+    max_size: Optional[int] = config.HTTP_MAX_DOWNLOAD_SIZE,
+    **kwargs,
 ) -> bytes:
-    """Get raw content like files and media as bytes"""
-    session = await ensure_session(session)
+    """
+    Get raw content like files and media as bytes, using the default session if `session` is not passed
 
-    async with session.get(
-        url, ssl=True if url.lower().startswith("https") else False, **kwargs
-    ) as response:
-        return await response.content.read()
+    Goes through the default `HTTPCache` if one is set, unless `cache` is False. Raises `ContentTooLargeError` if the
+    content is bigger than `max_size` bytes. Concurrent calls for the same URL share a single download.
+    """
+    session = ensure_session(session)
+
+    async def download() -> bytes:
+        http_cache = get_default_cache() if cache else None
+        if http_cache is not None and is_cacheable(kwargs):
+            cached = await http_cache.fetch(session, url, max_size=max_size, **kwargs)
+            return cached.body
+
+        async with http_get(session, url, **kwargs) as response:
+            return await _read_response(response, max_size=max_size)
+
+    # Requests with caller-specific options can't be shared
+    if kwargs:
+        return await download()
+
+    return await _flights.run(("GET", url, id(session), cache, max_size), download)
 
 
 async def read_website(
-    url: str, *, session: Optional[aiohttp.ClientSession] = None, **kwargs
+    url: str,
+    *,
+    session: Optional[aiohttp.ClientSession] = None,
+    cache: bool = True,
+    max_size: Optional[int] = config.HTTP_MAX_DOWNLOAD_SIZE,
+    main_content: bool = False,
+    **kwargs,
 ) -> str:
-    """Reads a website and returns markdown."""
-    session = await ensure_session(session)
-
-    async with session.get(
-        url,
-        ssl=True if url.lower().startswith("https") else False,
-        allow_redirects=True,
-        **kwargs
+    """
+    Reads a website and returns markdown.
+
+    Goes through the default `HTTPCache` if one is set, unless `cache` is False. Raises `ContentTooLargeError` if the
+    page is bigger than `max_size` bytes. The conversion to markdown runs in a worker process, see `html_to_markdown`
+    for `main_content`.
+    """
+    session = ensure_session(session)
+
+    http_cache = get_default_cache() if cache else None
+    if http_cache is not None and is_cacheable(kwargs):
+        cached = await http_cache.fetch(
+            session, url, raise_for_status=True, max_size=max_size, **kwargs
+        )
+        html = decode_html(cached.body, cached.content_type)
+        return await html_to_markdown(html, main_content=main_content)
+
+    async with http_get(session, url, allow_redirects=True, **kwargs) as response:
+        response.raise_for_status()
+        body = await _read_response(response, max_size=max_size)
+        html = decode_html(body, response.headers.get("Content-Type"))
+
+    # Only get the visible text as markdown, not the entire HTML
+    return await html_to_markdown(html, main_content=main_content)
+
+
+async def _fetch_search_page(
+    session: aiohttp.ClientSession,
+    query: str,
+    pageno: int,
+    *,
+    searxng_url: str,
+    **kwargs,
+) -> list[SearchResult]:
+    async with http_get(
+        session,
+        searxng_url,
+        params={"q": query, "format": "json", "pageno": pageno},
+        **kwargs,
     ) as response:
         response.raise_for_status()
-        html = await response.text()
+        data = await response.json()
+        return [
+            SearchResult(
+                url=r["url"],
+                title=r.get("title"),
+                content=r.get("content"),
+                published_date=r.get("publishedDate"),
+                engines=r["engines"],
+                score=r["score"],
+            )
+            for r in data["results"]
+        ]
+
+
+def _fetch_search_pages(
+    session: aiohttp.ClientSession,
+    query: str,
+    pages: int,
+    *,
+    searxng_url: str,
+    max_concurrency: int,
+    **kwargs,
+) -> list[Coroutine[Any, Any, list[SearchResult]]]:
+    """Get a coroutine for every search results page, which run at most `max_concurrency` at a time."""
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch_page(pageno: int) -> list[SearchResult]:
+        async with semaphore:
+            return await _fetch_search_page(
+                session, query, pageno, searxng_url=searxng_url, **kwargs
+            )
+
+    return [fetch_page(pageno) for pageno in range(1, pages + 1)]
+
+
+async def iter_search_web(
+    query: str,
+    pages: int = 1,
+    *,
+    session: Optional[aiohttp.ClientSession] = None,
+    searxng_url: str,
+    max_concurrency: int = 5,
+    **kwargs,
+) -> AsyncIterator[SearchResult]:
+    """
+    Searches the web using SearXNG, yielding results as their pages arrive.
+
+    Pages are fetched concurrently, at most `max_concurrency` at a time. Results whose URL was already yielded from
+    another page are skipped. A page that fails is logged and skipped; the error is only raised if every page failed.
+    """
+    tasks = [
+        asyncio.create_task(page)
+        for page in _fetch_search_pages(
+            ensure_session(session),
+            query,
+            pages,
+            searxng_url=searxng_url,
+            max_concurrency=max_concurrency,
+            **kwargs,
+        )
+    ]
+    seen: set[str] = set()
+    errors: list[Exception] = []
+
+    try:
+        for next_page in asyncio.as_completed(tasks):
+            try:
+                results = await next_page
+            except Exception as e:
+                logger.warning(
+                    f"failed to fetch a search results page for {query!r}", exc_info=e
+                )
+                errors.append(e)
+                continue
+
+            for result in results:
+                if result.url not in seen:
+                    seen.add(result.url)
+                    yield result
 
-        # Only get the visible text as markdown, not the entire HTML
-        return markdownify(html)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if errors and len(errors) == len(tasks):
+        raise errors[0]
 
 
 async def search_web(
@@ -70,35 +932,154 @@ async def search_web(
     *,
     session: Optional[aiohttp.ClientSession] = None,
     searxng_url: str,
-    **kwargs
+    max_concurrency: int = 5,
+    **kwargs,
 ) -> list[SearchResult] | str:
-    """Searches the web using SearXNG."""
-    session = await ensure_session(session)
+    """
+    Searches the web using SearXNG.
+
+    Pages are fetched concurrently and their results are merged, keeping the best scoring result for every URL. If
+    some pages fail, the results of the other pages are still returned; if all of them fail, the traceback of the
+    first error is returned instead.
+    """
+    pages_results = await asyncio.gather(
+        *_fetch_search_pages(
+            ensure_session(session),
+            query,
+            pages,
+            searxng_url=searxng_url,
+            max_concurrency=max_concurrency,
+            **kwargs,
+        ),
+        return_exceptions=True,
+    )
+
+    best: dict[str, SearchResult] = {}
+    errors: list[BaseException] = []
+    for page_results in pages_results:
+        if isinstance(page_results, BaseException):
+            errors.append(page_results)
+            continue
+
+        for result in page_results:
+            current = best.get(result.url)
+            if current is None or result.score > current.score:
+                best[result.url] = result
+
+    if errors and len(errors) == len(pages_results):
+        return "".join(traceback.format_exception(errors[0]))
+
+    for e in errors:
+        logger.warning(
+            f"failed to fetch a search results page for {query!r}", exc_info=e
+        )
+
+    return sorted(best.values(), key=lambda x: x.score, reverse=True)
+
+
+async def research_web(
+    query: str,
+    limit: Optional[int] = 5,
+    *,
+    pages: int = 1,
+    session: Optional[aiohttp.ClientSession] = None,
+    searxng_url: str,
+    max_fetchers: int = config.WEB_RESEARCH_FETCHERS,
+    page_timeout: Optional[float] = config.WEB_RESEARCH_PAGE_TIMEOUT,
+    main_content: bool = True,
+    max_size: Optional[int] = config.HTTP_MAX_DOWNLOAD_SIZE,
+    **kwargs,
+) -> AsyncIterator[WebDocument]:
+    """
+    Searches the web and reads the results, yielding every page as markdown as soon as it is ready.
+
+    Results are read while the search pages are still arriving, at most `max_fetchers` at a time. Pages that fail
+    or take longer than `page_timeout` seconds are logged and skipped, and the next results are read in their place,
+    so slow sites never hold up the others.
+
+    Args:
+        query (str): The search query.
+        limit (Optional[int]): Stop after this many documents. None to read every result. Defaults to 5.
+        pages (int): The amount of search result pages to fetch. Defaults to 1.
+        session (Optional[aiohttp.ClientSession]): The session to use. Defaults to the default session.
+        searxng_url (str): The URL of the SearXNG search endpoint.
+        max_fetchers (int): The most pages to download and convert at the same time.
+        page_timeout (Optional[float]): Seconds to give every page to be downloaded and converted. None for no
+            limit.
+        main_content (bool): Only convert the main content of the pages, see `html_to_markdown`. Defaults to True.
+        max_size (Optional[int]): The maximum size of a page in bytes, bigger pages are skipped.
+
+    Raises:
+        aiohttp.ClientError: Every search results page failed, see `iter_search_web`.
+
+    Yields:
+        WebDocument: The markdown of a page with the search result it came from and the seconds since the search
+            started, in the order the pages finished.
+    """
+    session = ensure_session(session)
+    loop = asyncio.get_running_loop()
+    started_at = loop.time()
+
+    # Every read puts its document, or None if it failed, then the feeder puts a sentinel once everything is done
+    done = object()
+    finished: asyncio.Queue[Any] = asyncio.Queue()
+    fetchers = asyncio.Semaphore(max_fetchers)
+    reads: set[asyncio.Task[None]] = set()
+
+    async def read(result: SearchResult) -> None:
+        try:
+            markdown = await asyncio.wait_for(
+                read_website(
+                    result.url,
+                    session=session,
+                    max_size=max_size,
+                    main_content=main_content,
+                ),
+                page_timeout,
+            )
+        except Exception as e:
+            logger.debug(f"skipping {result.url} while researching {query!r}: {e!r}")
+            finished.put_nowait(None)
+        else:
+            finished.put_nowait(WebDocument(result, markdown, loop.time() - started_at))
+        finally:
+            fetchers.release()
+
+    async def feed() -> None:
+        try:
+            async for result in iter_search_web(
+                query, pages, session=session, searxng_url=searxng_url, **kwargs
+            ):
+                await fetchers.acquire()
+                task = asyncio.create_task(read(result))
+                reads.add(task)
+                task.add_done_callback(reads.discard)
+
+            # Every fetcher slot is free again once the last read finished
+            for _ in range(max_fetchers):
+                await fetchers.acquire()
+        except Exception as e:
+            finished.put_nowait(e)
+        else:
+            finished.put_nowait(done)
+
+    feeder = asyncio.create_task(feed())
+    yielded = 0
 
-    search_results = []
     try:
-        for pageno in range(1, pages + 1):
-            async with session.get(
-                searxng_url,
-                params={"q": query, "format": "json", "pageno": pageno},
-                ssl=True if searxng_url.lower().startswith("https") else False,
-                **kwargs
-            ) as response:
-                response.raise_for_status()
-                data = await response.json()
-                search_results += [
-                    SearchResult(
-                        url=r["url"],
-                        title=r.get("title"),
-                        content=r.get("content"),
-                        published_date=r.get("publishedDate"),
-                        engines=r["engines"],
-                        score=r["score"],
-                    )
-                    for r in data["results"]
-                ]
-
-    except Exception as e:
-        return "".join(traceback.format_exception(e))
-
-    return sorted(search_results, key=lambda x: x.score, reverse=True)
+        while limit is None or yielded < limit:
+            item = await finished.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            if item is None:
+                continue
+
+            yield item
+            yielded += 1
+
+    finally:
+        feeder.cancel()
+        for task in list(reads):
+            task.cancel()
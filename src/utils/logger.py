@@ -1,16 +1,31 @@
 import os
 import sys
+import copy
+import queue
+import atexit
 import logging
+import logging.handlers
 from typing import Optional, Any, cast
+from datetime import datetime, timezone
 
-from .termcolors import *
+from .. import config
+from ..termcolors import *
+
+import orjson
 
 __all__ = (
     "is_docker",
     "stream_supports_colour",
     "ColourFormatter",
+    "JSONFormatter",
+    "LogQueueHandler",
     "setup_logging",
     "get_logger",
+    "get_log_formatter",
+    "get_queue_handler",
+    "add_log_handler",
+    "queue_log_handlers",
+    "stop_log_queues",
 )
 
 # code heavily inspired from discord.utils.setup_logging
@@ -76,6 +91,168 @@ class ColourFormatter(logging.Formatter):
         return output
 
 
+# Attributes every log record has, anything else on a record was passed with `extra`
+RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {
+    "message",
+    "asctime",
+    "taskName",
+}
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line, for log pipelines and search tools to read without parsing text.
+
+    Every object has a `timestamp` (ISO 8601 in UTC), `level`, `logger` and `message`, an `exception` and `stack` when
+    the record has them, and the fields passed with `extra`, like
+    `logger.info("...", extra={"user_id": user.id, "guild_id": guild.id})`.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: dict[str, Any] = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exception"] = record.exc_text
+        if record.stack_info:
+            payload["stack"] = self.formatStack(record.stack_info)
+
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES and not key.startswith("_"):
+                payload.setdefault(key, value)
+
+        return orjson.dumps(
+            payload,
+            default=str,
+            option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS,
+        ).decode()
+
+
+class _LogQueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Wait for room instead of failing while the queue is full, the listener is still emptying it
+        self.queue.put(self._sentinel)
+
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands log records to a listener thread that owns the real handlers, so logging never waits for a terminal or disk.
+
+    The queue holds at most `maxsize` records. While it is full, records are dropped and counted in `dropped` instead
+    of blocking, and a warning saying how many were dropped is queued once there is room again.
+    """
+
+    def __init__(self, maxsize: int = config.LOG_QUEUE_SIZE) -> None:
+        super().__init__(queue.Queue(maxsize))
+        self.listener = _LogQueueListener(self.queue, respect_handler_level=True)
+        self.dropped = 0
+        self._unreported = 0
+
+    @property
+    def handlers(self) -> tuple[logging.Handler, ...]:
+        """The real handlers the records are handed to."""
+        return self.listener.handlers
+
+    def add_handler(self, handler: logging.Handler) -> None:
+        self.listener.handlers = (*self.listener.handlers, handler)
+
+    def start(self) -> None:
+        if self.listener._thread is None:
+            self.listener.start()
+
+    def stop(self) -> None:
+        """Wait for the listener to handle every queued record, then flush the real handlers."""
+        if self.listener._thread is not None:
+            self.listener.stop()
+        for handler in self.handlers:
+            handler.flush()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Unlike QueueHandler.prepare, leave formatting the exception to the real handlers and keep the extra fields,
+        # the record never leaves the process
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        # Called with the handler's lock held
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self._unreported += 1
+            return
+
+        if self._unreported:
+            warning = logging.LogRecord(
+                __name__,
+                logging.WARNING,
+                __file__,
+                0,
+                "dropped %d log records, the log queue was full",
+                (self._unreported,),
+                None,
+            )
+            try:
+                self.queue.put_nowait(self.prepare(warning))
+            except queue.Full:
+                return
+            self._unreported = 0
+
+
+_queue_handlers: dict[str, LogQueueHandler] = {}
+
+
+def get_queue_handler(logger: logging.Logger) -> LogQueueHandler:
+    """Get the queue handler of a logger, adding and starting one if it doesn't have one yet."""
+    handler = _queue_handlers.get(logger.name)
+    if handler is None:
+        if not _queue_handlers:
+            atexit.register(stop_log_queues)
+        handler = _queue_handlers[logger.name] = LogQueueHandler()
+        logger.addHandler(handler)
+    handler.start()
+    return handler
+
+
+def add_log_handler(logger: logging.Logger, handler: logging.Handler) -> None:
+    """Add a handler to a logger behind the logger's queue, see `LogQueueHandler`."""
+    get_queue_handler(logger).add_handler(handler)
+
+
+def queue_log_handlers(logger: logging.Logger) -> None:
+    """Move the handlers already on a logger behind its queue, for loggers set up elsewhere like discord.py's."""
+    for handler in list(logger.handlers):
+        if not isinstance(handler, LogQueueHandler):
+            logger.removeHandler(handler)
+            add_log_handler(logger, handler)
+
+
+def stop_log_queues() -> None:
+    """
+    Handle every queued record and stop the listener threads.
+
+    The real handlers are put back on their loggers, so anything logged afterwards is still written, just not in the
+    background anymore.
+    """
+    while _queue_handlers:
+        name, queue_handler = _queue_handlers.popitem()
+        queue_handler.stop()
+
+        logger = logging.getLogger(name) if name != "root" else logging.getLogger()
+        logger.removeHandler(queue_handler)
+        for handler in queue_handler.handlers:
+            logger.addHandler(handler)
+
+
 def setup_logging(
     *,
     name: str,
@@ -84,6 +261,7 @@ def setup_logging(
     formatter: Optional[logging.Formatter] = None,
     level: Optional[int] = None,
     root: bool = False,
+    queued: bool = True,
 ) -> None:
     if level is None:
         level = logging.INFO
@@ -110,10 +288,27 @@ def setup_logging(
     handler.setLevel(level)
     handler.setFormatter(formatter)
     logger.setLevel(logging.DEBUG)
-    
+
     # Cast back to logging.Handler to strip the partially unknown type for strict mode
-    logger.addHandler(cast(logging.Handler, handler))
+    if queued:
+        add_log_handler(logger, cast(logging.Handler, handler))
+    else:
+        logger.addHandler(cast(logging.Handler, handler))
 
 
 def get_logger(name: str) -> logging.Logger:
     return logging.getLogger(name)
+
+
+def get_log_formatter(format: str) -> Optional[logging.Formatter]:
+    """
+    Get the formatter for a log format from the config.
+
+    Returns:
+        Optional[logging.Formatter]: A `JSONFormatter` for "json", None for "text" to keep the handler's usual format.
+    """
+    if format == "json":
+        return JSONFormatter()
+    if format == "text":
+        return None
+    raise ValueError(f"unknown log format {format!r}, expected 'text' or 'json'")
@@ -0,0 +1,141 @@
+import asyncio
+import multiprocessing
+from typing import Any, Callable, Optional, TypeVar
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .logger import get_logger
+
+__all__ = ("ProcessPool",)
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+
+def _call_soon_threadsafe(
+    loop: asyncio.AbstractEventLoop, callback: Callable[[], Any]
+) -> None:
+    """Schedule a callback on the loop from another thread, unless the loop was closed in the meantime."""
+    try:
+        loop.call_soon_threadsafe(callback)
+    except RuntimeError:
+        pass
+
+
+class ProcessPool:
+    """
+    A pool of worker processes that replaces itself when a worker gets stuck or dies.
+
+    The workers are started with `spawn` on the first job. A job that times out after a worker picked it up keeps
+    that worker busy, so new jobs go to a fresh pool right away and the old one is killed once the jobs already in it
+    had the same time to finish. Those jobs fail with `BrokenProcessPool` if they are still running by then.
+
+    Examples:
+        >>> pool = ProcessPool(2, name="HTML conversion")
+        >>> await pool.run(convert, html, timeout=10)
+        >>> pool.shutdown()
+    """
+
+    def __init__(self, max_workers: int, *, name: str = "process pool") -> None:
+        self.max_workers = max_workers
+        self.name = name
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Pools replaced because a worker got stuck, and the timers that kill them
+        self._retired: dict[ProcessPoolExecutor, asyncio.TimerHandle] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._executor is not None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    @staticmethod
+    def _terminate(executor: ProcessPoolExecutor) -> None:
+        # The worker processes are only exposed publicly from Python 3.14 on
+        processes = list((executor._processes or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+
+    def _retire(self, executor: ProcessPoolExecutor, grace: float) -> None:
+        """Send new jobs to a fresh pool and kill this one once the jobs already in it had `grace` seconds to finish."""
+        if self._executor is executor:
+            self._executor = None
+        if executor not in self._retired:
+
+            def terminate() -> None:
+                self._retired.pop(executor, None)
+                self._terminate(executor)
+
+            self._retired[executor] = asyncio.get_running_loop().call_later(
+                grace, terminate
+            )
+
+    async def run(
+        self,
+        function: Callable[..., T],
+        *args: Any,
+        timeout: Optional[float] = None,
+        on_done: Optional[Callable[[], None]] = None,
+    ) -> T:
+        """
+        Run a function in a worker process and wait for its result.
+
+        Args:
+            function (Callable[..., T]): The function to run, which has to be importable by the workers.
+            *args (Any): The arguments to call it with, which have to be picklable.
+            timeout (Optional[float]): Seconds to wait for the result. None to wait forever.
+            on_done (Optional[Callable[[], None]]): Called on the event loop once the worker is done with the job,
+                which can be after this stopped waiting for it, or right away if the job couldn't be submitted. For
+                releasing what the worker uses, like shared memory.
+
+        Raises:
+            asyncio.TimeoutError: The job took longer than `timeout`.
+            BrokenProcessPool: A worker died. The pool is replaced for the next jobs.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        try:
+            future: Future[T] = executor.submit(function, *args)
+        except BaseException as e:
+            if isinstance(e, BrokenProcessPool):
+                self._retire(executor, 0)
+            if on_done is not None:
+                on_done()
+            raise
+
+        if on_done is not None:
+            future.add_done_callback(lambda _: _call_soon_threadsafe(loop, on_done))
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            # Jobs no worker picked up yet can still be cancelled, the others are stuck in a worker
+            if not future.cancel() and not future.done():
+                logger.warning(
+                    f"{self.name} took longer than {timeout}s, replacing its worker pool"
+                )
+                self._retire(executor, timeout or 0)
+            raise
+        except BrokenProcessPool:
+            self._retire(executor, 0)
+            raise
+
+    def shutdown(self) -> None:
+        """Stop the workers, cancelling the jobs that haven't started and killing stuck ones. They are started again on the next job."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+        for executor, timer in list(self._retired.items()):
+            timer.cancel()
+            self._terminate(executor)
+        self._retired.clear()
@@ -1,80 +1,646 @@
+import os
+import heapq
 import string
-from typing import TypeVar, Callable
+import asyncio
+import itertools
+import unicodedata
+import multiprocessing
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from typing import (
+    Any,
+    TypeVar,
+    Callable,
+    Generic,
+    Hashable,
+    Iterable,
+    Awaitable,
+    Optional,
+)
+
+from .logger import get_logger
 
 __all__ = (
+    "NormalizedText",
+    "normalize",
+    "SearchIndex",
+    "ShardedSearchIndex",
+    "ShardLostError",
     "match",
     "get_matches",
     "get_matches_by_attr",
     "get_identifiable_matches",
 )
 
+logger = get_logger(__name__)
+
 T = TypeVar("T")
+K = TypeVar("K", bound=Hashable)
+
+NORMALIZE_CACHE_SIZE = 8192
+
+
+class NormalizedText:
+    """
+    A pre-normalized piece of text used by the `match*` functions.
+
+    Holds the casefolded, accent-stripped version of the text alongside its fragments so that corpus strings only have
+    to be normalized once instead of on every comparison. Create these with `normalize` instead of directly, which
+    caches them.
+
+    Attributes:
+        original (str | tuple[str, ...]): The text as it was before normalization.
+        text (str): The normalized text. For list inputs the normalized fragments are joined with a space.
+        fragments (tuple[str, ...]): The normalized fragments of the text.
+    """
+
+    __slots__ = ("original", "text", "fragments", "__weakref__")
+
+    original: str | tuple[str, ...]
+    text: str
+    fragments: tuple[str, ...]
+
+    def __init__(
+        self, original: str | tuple[str, ...], text: str, fragments: tuple[str, ...]
+    ) -> None:
+        self.original = original
+        self.text = text
+        self.fragments = fragments
+
+    def __repr__(self) -> str:
+        return f"NormalizedText({self.original!r})"
+
+
+def _fold(text: str) -> str:
+    """Casefold `text` and strip accents from it (`"Amélie"` -> `"amelie"`)."""
+    # ASCII text has nothing to strip, and casefolding it is the same as lowercasing
+    if text.isascii():
+        return text.lower()
+
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def _split(text: str, splitter: str) -> tuple[str, ...]:
+    # `string.whitespace` means "any whitespace", which is what `str.split()` does
+    if splitter == string.whitespace:
+        return tuple(text.split())
+    return tuple(fragment for fragment in text.split(splitter) if fragment)
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def _normalize(
+    text: str | tuple[str, ...], splitter: str = string.whitespace
+) -> NormalizedText:
+    if isinstance(text, str):
+        folded = _fold(text)
+        return NormalizedText(text, folded, _split(folded, splitter))
+
+    fragments = tuple(_fold(fragment) for fragment in text)
+    return NormalizedText(text, " ".join(fragments), fragments)
+
+
+def normalize(
+    text: "str | list[str] | tuple[str, ...] | NormalizedText",
+    *,
+    splitter: str = string.whitespace,
+    cache: bool = True,
+) -> NormalizedText:
+    """
+    Normalize text for matching, reusing a cached result if the same text was normalized before.
+
+    Strings are casefolded, stripped of accents and split into fragments by `splitter`. Lists of strings are treated as
+    already split, each element being a fragment. Strings are immutable and can't be weakly referenced, so results are
+    kept in a bounded LRU cache instead of a weak mapping.
+
+    Args:
+        text (str | list[str] | tuple[str, ...] | NormalizedText): The text to normalize. `NormalizedText` is returned
+            as is.
+        splitter (str): The delimiter used to split `text` when it is a string. Defaults to any whitespace.
+        cache (bool): Whether to go through the cache. Bulk one-off normalizations (like building a `SearchIndex`)
+            should pass `False` so they don't push frequently matched text out of the cache. Defaults to True.
+
+    Returns:
+        NormalizedText: The normalized text.
+
+    Examples:
+        >>> normalize("Crème  Brûlée").fragments
+        ('creme', 'brulee')
+    """
+    if isinstance(text, NormalizedText):
+        return text
+    if isinstance(text, list):
+        text = tuple(text)
+    if not cache:
+        return _normalize.__wrapped__(text, splitter)
+    return _normalize(text, splitter)
+
+
+class SearchIndex(Generic[K]):
+    """
+    An in-memory n-gram index that answers `match` queries without scanning every entry.
+
+    Every entry is normalized once when it is added, and each of its fragments is broken up into n-grams that point
+    back to the entry. A query only has to look at the entries that contain every n-gram of every query fragment,
+    which are then confirmed with `match`. Query fragments shorter than `gram_size` can't use the n-grams, so those
+    queries fall back to scanning every pre-normalized entry.
+
+    Results are ranked with exact matches first, then entries starting with the query, then everything else.
+
+    Examples:
+        >>> index = SearchIndex()
+        >>> index.add(1, "Hello World")
+        >>> index.add(2, "Crème Brûlée")
+        >>> index.search("wor")
+        [1]
+        >>> index.search("creme")
+        [2]
+    """
+
+    def __init__(self, *, gram_size: int = 3) -> None:
+        self.gram_size = gram_size
+        self._entries: dict[K, NormalizedText] = {}
+        self._postings: dict[str, set[K]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._entries
+
+    def _grams(self, fragments: tuple[str, ...]) -> set[str]:
+        size = self.gram_size
+        return {
+            fragment[i : i + size]
+            for fragment in fragments
+            for i in range(len(fragment) - size + 1)
+        }
+
+    def add(self, key: K, text: str | list[str] | NormalizedText) -> None:
+        """Add an entry to the index, replacing the existing entry with the same key."""
+        if key in self._entries:
+            self.remove(key)
+
+        normalized = normalize(text, cache=False)
+        self._entries[key] = normalized
+        for gram in self._grams(normalized.fragments):
+            self._postings.setdefault(gram, set()).add(key)
+
+    def remove(self, key: K) -> bool:
+        """Remove an entry from the index. Returns whether the entry existed."""
+        normalized = self._entries.pop(key, None)
+        if normalized is None:
+            return False
+
+        for gram in self._grams(normalized.fragments):
+            keys = self._postings.get(gram)
+            if keys is None:
+                continue
+            keys.discard(key)
+            if not keys:
+                del self._postings[gram]
+
+        return True
+
+    def clear(self) -> None:
+        """Remove all entries from the index."""
+        self._entries.clear()
+        self._postings.clear()
+
+    def search(
+        self, query: str | NormalizedText, *, limit: Optional[int] = None
+    ) -> list[K]:
+        """
+        Find the keys of all entries that `match` the query.
+
+        Args:
+            query (str | NormalizedText): The query to search for.
+            limit (Optional[int]): The maximum number of keys to return. Defaults to no limit.
+
+        Returns:
+            list[K]: The keys of the matching entries, best matches first.
+        """
+        return [key for _, key in self._search_ranked(query, limit=limit)]
+
+    def _search_ranked(
+        self, query: str | NormalizedText, *, limit: Optional[int] = None
+    ) -> list[tuple[tuple[int, int], K]]:
+        normalized_query = normalize(query)
+        if not normalized_query.fragments:
+            return []
+
+        if all(
+            len(fragment) >= self.gram_size for fragment in normalized_query.fragments
+        ):
+            postings = []
+            for gram in self._grams(normalized_query.fragments):
+                keys = self._postings.get(gram)
+                if keys is None:
+                    return []
+                postings.append(keys)
+
+            postings.sort(key=len)
+            candidates = postings[0].intersection(*postings[1:])
+            results = [
+                key for key in candidates if match(normalized_query, self._entries[key])
+            ]
+
+        else:
+            # Every match has to be ranked before cutting at `limit`, the best ones can be anywhere in the entries
+            results = [
+                key
+                for key, normalized in self._entries.items()
+                if match(normalized_query, normalized)
+            ]
+
+        def rank(key: K) -> tuple[int, int]:
+            text = self._entries[key].text
+            if text == normalized_query.text:
+                return (0, len(text))
+            if text.startswith(normalized_query.text):
+                return (1, len(text))
+            return (2, len(text))
+
+        ranked = ((rank(key), key) for key in results)
+        if limit is None:
+            return sorted(ranked, key=lambda x: x[0])
+        return heapq.nsmallest(limit, ranked, key=lambda x: x[0])
+
+
+def _shard_worker(connection: Connection, gram_size: int) -> None:
+    """Serve one partition of a `ShardedSearchIndex` over a pipe until told to stop."""
+    index: SearchIndex[Any] = SearchIndex(gram_size=gram_size)
+
+    while True:
+        try:
+            command, *args = connection.recv()
+        except EOFError:
+            return
+
+        try:
+            if command == "add":
+                for key, text in args[0]:
+                    index.add(key, text)
+                result = None
+            elif command == "remove":
+                result = sum(index.remove(key) for key in args[0])
+            elif command == "search":
+                result = index._search_ranked(args[0], limit=args[1])
+            elif command == "len":
+                result = len(index)
+            elif command == "clear":
+                index.clear()
+                result = None
+            elif command == "close":
+                connection.send((True, None))
+                return
+            else:
+                raise ValueError(f"unknown command {command!r}")
+
+        except Exception as e:
+            connection.send((False, e))
+        else:
+            connection.send((True, result))
+
+
+class ShardLostError(RuntimeError):
+    """
+    Raised when the worker of a `ShardedSearchIndex` shard died or its pipe broke.
+
+    The shard is restarted with an empty partition and listed in `ShardedSearchIndex.lost_shards` until the index is
+    cleared. The entries that belonged to it have to be added again, see `ShardedSearchIndex.shard_of`.
+    """
+
+    def __init__(self, shard: int) -> None:
+        super().__init__(f"lost shard {shard} of the sharded search index")
+        self.shard = shard
+
+
+class ShardedSearchIndex(Generic[K]):
+    """
+    A `SearchIndex` split across a small pool of worker processes.
+
+    Entries are partitioned by key, and each worker holds its partition in memory and answers queries over a pipe.
+    Queries are sent to every worker at once and the ranked results are merged in this process, so building and
+    querying huge corpora never runs on the event loop and can use more than one core. Keys and texts have to be
+    picklable.
+
+    Attributes:
+        lost_shards (set[int]): Shards whose worker died and was restarted empty since the index was last cleared.
+            Searches miss their entries until they are added again, so discard a shard from this set once it is
+            rebuilt.
+        restarts (int): How many times a worker was replaced.
+
+    Examples:
+        >>> async with ShardedSearchIndex(processes=4) as index:
+        ...     await index.add_many((tag.id, tag.name) for tag in tags)
+        ...     await index.search("cat", limit=25)
+    """
+
+    def __init__(self, *, processes: Optional[int] = None, gram_size: int = 3) -> None:
+        self.processes = processes or min(4, os.cpu_count() or 1)
+        self.gram_size = gram_size
+        self._connections: list[Connection] = []
+        self._workers: list[BaseProcess] = []
+        self._locks: list[asyncio.Lock] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._recoveries: set[asyncio.Task[None]] = set()
+        self.lost_shards: set[int] = set()
+        self.restarts = 0
+
+    async def __aenter__(self) -> "ShardedSearchIndex[K]":
+        self.start()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._workers)
+
+    @property
+    def degraded(self) -> bool:
+        """Whether searches are missing the entries of a lost shard, see `lost_shards`."""
+        return bool(self.lost_shards)
+
+    def start(self) -> None:
+        """Start the worker processes."""
+        if self.is_running:
+            return
+
+        for _ in range(self.processes):
+            connection, worker = self._spawn()
+            self._connections.append(connection)
+            self._workers.append(worker)
+            self._locks.append(asyncio.Lock())
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.processes, thread_name_prefix="search-shard"
+        )
+
+    async def close(self) -> None:
+        """Stop the worker processes, dropping the index."""
+        if not self.is_running:
+            return
+
+        await asyncio.gather(
+            *(self._request(shard, ("close",)) for shard in range(self.processes)),
+            return_exceptions=True,
+        )
+        for connection, worker in zip(self._connections, self._workers):
+            connection.close()
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+
+        assert self._executor is not None
+        self._executor.shutdown(wait=False)
+        self._executor = None
+        self._connections.clear()
+        self._workers.clear()
+        self._locks.clear()
+        self.lost_shards.clear()
+
+    def _spawn(self) -> tuple[Connection, BaseProcess]:
+        context = multiprocessing.get_context("spawn")
+        parent, child = context.Pipe()
+        worker = context.Process(
+            target=_shard_worker, args=(child, self.gram_size), daemon=True
+        )
+        worker.start()
+        child.close()
+        return parent, worker
+
+    def _replace_worker(self, shard: int) -> None:
+        """Blocks, run it in the executor with the shard's lock held."""
+        self._connections[shard].close()
+        worker = self._workers[shard]
+        worker.terminate()
+        worker.join(timeout=5)
+
+        self._connections[shard], self._workers[shard] = self._spawn()
+        self.restarts += 1
+
+    async def _recover(self, shard: int) -> None:
+        logger.warning(
+            f"lost shard {shard} of a sharded search index, restarting it empty: "
+            f"searches miss its entries until they are added again"
+        )
+        self.lost_shards.add(shard)
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._replace_worker, shard
+            )
+        except Exception as e:
+            logger.error(f"couldn't restart shard {shard}", exc_info=e)
+
+    async def restart_shard(self, shard: int) -> None:
+        """
+        Replace the worker of a shard with a new, empty one, once the requests to it are done.
+
+        The shard is added to `lost_shards`. Shards whose pipe breaks are restarted on their own, see `ShardLostError`.
+        """
+        async with self._locks[shard]:
+            self.lost_shards.add(shard)
+            await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._replace_worker, shard
+            )
+
+    def shard_of(self, key: K) -> int:
+        """Get the shard an entry is stored in, for example to add the entries of a lost shard again."""
+        return hash(key) % self.processes
+
+    def _exchange(self, shard: int, message: tuple[Any, ...]) -> Any:
+        connection = self._connections[shard]
+        try:
+            connection.send(message)
+            ok, result = connection.recv()
+        except (EOFError, OSError) as e:
+            raise ShardLostError(shard) from e
+
+        if not ok:
+            raise result
+        return result
+
+    async def _request(self, shard: int, message: tuple[Any, ...]) -> Any:
+        if not self.is_running:
+            raise RuntimeError("the sharded search index is not running")
+
+        lock = self._locks[shard]
+        await lock.acquire()
+        try:
+            future = asyncio.get_running_loop().run_in_executor(
+                self._executor, self._exchange, shard, message
+            )
+        except BaseException:
+            lock.release()
+            raise
+
+        def finish(future: "asyncio.Future[Any]") -> None:
+            # The pipe is only free again once the thread is done with it, even if the caller stopped waiting
+            if future.cancelled() or not isinstance(future.exception(), ShardLostError):
+                lock.release()
+                return
+
+            # Replacing the worker blocks, so it runs in the executor and the shard stays locked until it is done
+            recovery = asyncio.ensure_future(self._recover(shard))
+            self._recoveries.add(recovery)
+            recovery.add_done_callback(self._recoveries.discard)
+            recovery.add_done_callback(lambda _: lock.release())
+
+        future.add_done_callback(finish)
+        return await asyncio.shield(future)
+
+    async def _broadcast(self, message: tuple[Any, ...]) -> list[Any]:
+        return await asyncio.gather(
+            *(self._request(shard, message) for shard in range(self.processes))
+        )
+
+    async def add_many(
+        self,
+        entries: Iterable[tuple[K, str | list[str]]],
+        *,
+        batch_size: int = 10000,
+    ) -> None:
+        """Add entries to the index, replacing existing entries with the same keys."""
+        batches: list[list[tuple[K, str | list[str]]]] = [
+            [] for _ in range(self.processes)
+        ]
+        pending: list[Awaitable[Any]] = []
+
+        for key, text in entries:
+            shard = self.shard_of(key)
+            batches[shard].append((key, text))
+            if len(batches[shard]) >= batch_size:
+                pending.append(self._request(shard, ("add", batches[shard])))
+                batches[shard] = []
+
+        for shard, batch in enumerate(batches):
+            if batch:
+                pending.append(self._request(shard, ("add", batch)))
+
+        await asyncio.gather(*pending)
+
+    async def add(self, key: K, text: str | list[str]) -> None:
+        """Add an entry to the index, replacing the existing entry with the same key."""
+        await self._request(self.shard_of(key), ("add", [(key, text)]))
+
+    async def remove(self, key: K) -> bool:
+        """Remove an entry from the index. Returns whether the entry existed."""
+        return bool(await self._request(self.shard_of(key), ("remove", [key])))
+
+    async def clear(self) -> None:
+        """Remove all entries from the index, which also empties `lost_shards`."""
+        await self._broadcast(("clear",))
+        self.lost_shards.clear()
+
+    async def count(self) -> int:
+        """Get the amount of entries in the index."""
+        return sum(await self._broadcast(("len",)))
+
+    async def search(self, query: str, *, limit: Optional[int] = None) -> list[K]:
+        """
+        Find the keys of all entries that `match` the query across every worker.
+
+        Args:
+            query (str): The query to search for.
+            limit (Optional[int]): The maximum number of keys to return. Defaults to no limit.
+
+        Returns:
+            list[K]: The keys of the matching entries, best matches first. Entries of `lost_shards` are missing.
+        """
+        partitions = await self._broadcast(("search", query, limit))
+        merged = heapq.merge(*partitions, key=lambda x: x[0])
+        return [key for _, key in itertools.islice(merged, limit)]
 
 
 def match(
-    query: str | list[str], text: str | list[str], *, splitter: str = string.whitespace
+    query: str | list[str] | NormalizedText,
+    text: str | list[str] | NormalizedText,
+    *,
+    splitter: str = string.whitespace,
 ) -> bool:
     """
     Perform a kind-of fuzzy match between query and text by checking if all query fragments are substrings of some text
-    fragments, with case-insensitive matching.
+    fragments, with case-insensitive and accent-insensitive matching.
 
     **Behavior:**
-    - If both `query` and `text` are strings, first check if the query (lowercased) is a contiguous substring of the text
-      (lowercased). If so, return `True` immediately.
-    - Then, convert `query` and `text` into lists of lowercased fragments:
-      - If `query` is a string, it is lowercased and split by `splitter`.
-      - If `query` is a list, each element is lowercased.
-      - Similarly for `query`.
-    - Check if each lowercased query fragment is a contiguous substring of at least one lowercased text fragment.
+    - Casefold and strip accents from `query` and `text`. Strings are split into fragments by `splitter`, lists are
+      treated as already split. `query` goes through the `normalize` cache, while `text` is folded on the spot so that
+      scanning a large corpus doesn't churn the cache. `NormalizedText` records are used as they are, so corpus
+      strings that are matched often can be normalized once up front.
+    - If both `query` and `text` were strings, first check if the normalized query is a contiguous substring of the
+      normalized text. If so, return `True` immediately.
+    - Check if each normalized query fragment is a contiguous substring of at least one normalized text fragment.
     - Return `True` if all query fragments are found, `False` otherwise.
 
     Args:
-        query (str | list[str]): The query to search for. Can be a string or a list of strings.
-        text (str | list[str]): The text to search in. Can be a string or a list of strings.
-        splitter (str): The delimiter used to split `text` and `query` when they are strings (default: " ").
+        query (str | list[str] | NormalizedText): The query to search for. Can be a string, a list of strings or
+            pre-normalized text.
+        text (str | list[str] | NormalizedText): The text to search in. Can be a string, a list of strings or
+            pre-normalized text.
+        splitter (str): The delimiter used to split `text` and `query` when they are strings (default: any whitespace).
 
     Returns:
         bool: `True` if the query matches the text (case-insensitive), `False` otherwise.
 
     Examples:
-        >>> match_space_fuzzy("ell wor", "Hello World")
+        >>> match("ell wor", "Hello World")
         True  # "ell" in "hello", "wor" in "world"
-        >>> match_space_fuzzy(["Ell", "Wor"], ["Hello", "World"])
+        >>> match(["Ell", "Wor"], ["Hello", "World"])
         True  # "ell" in "hello", "wor" in "world"
-        >>> match_space_fuzzy("WORLD HELLO", "Hello World")
+        >>> match("WORLD HELLO", "Hello World")
         True  # "world" in "world", "hello" in "hello"
-        >>> match_space_fuzzy("xyz", "Hello World")
+        >>> match("creme", "Crème Brûlée")
+        True  # accents are ignored
+        >>> match("xyz", "Hello World")
         False # "xyz" not in "hello" or "world"
     """
-
-    # If both inputs are strings, do a quick substring check in lowercase
-    if isinstance(text, str) and isinstance(query, str):
-        text_lower = text.lower()
-        query_lower = query.lower()
-        if query_lower in text_lower:
-            return True
-
-    # Convert text and query to lists of lowercased fragments
-    text_fragments: list[str] = (
-        text.lower().split(splitter)
-        if isinstance(text, str)
-        else [frag.lower() for frag in text]
-    )
-    query_fragments: list[str] = (
-        query.lower().split(splitter)
-        if isinstance(query, str)
-        else [frag.lower() for frag in query]
-    )
+    normalized_query = normalize(query, splitter=splitter)
+
+    whole_text: Optional[str] = None
+    text_fragments: Optional[Iterable[str]] = None
+    if isinstance(text, str):
+        # Same as `_fold`, without the call for the common ASCII case
+        whole_text = text.lower() if text.isascii() else _fold(text)
+    elif isinstance(text, NormalizedText):
+        if isinstance(text.original, str):
+            whole_text = text.text
+        text_fragments = text.fragments
+    else:
+        text_fragments = [_fold(fragment) for fragment in text]
+
+    # If both inputs were strings, do a quick substring check on the whole text
+    if (
+        whole_text is not None
+        and isinstance(normalized_query.original, str)
+        and normalized_query.text in whole_text
+    ):
+        return True
+
+    if text_fragments is None:
+        assert whole_text is not None
+        text_fragments = (
+            whole_text.split()
+            if splitter is string.whitespace
+            else _split(whole_text, splitter)
+        )
 
     # Check if each query fragment is a substring of any text fragment
-    for query_fragment in query_fragments:
-        if not any(query_fragment in text_fragment for text_fragment in text_fragments):
+    for query_fragment in normalized_query.fragments:
+        for text_fragment in text_fragments:
+            if query_fragment in text_fragment:
+                break
+        else:
             return False
 
     return True
 
 
-def get_matches(query: str, search_list: list[str]) -> list[str]:
+def get_matches(query: str | NormalizedText, search_list: list[str]) -> list[str]:
     """
     Find strings in `search_list` that "match" the `query` string, where "match" means that all fragments of the string
     are substrings of some fragments of the `query`, using case-insensitive matching.
@@ -87,8 +653,8 @@ def get_matches(query: str, search_list: list[str]) -> list[str]:
       membership in the result list.
 
     Args:
-        query (str): The string within which to search for matches; acts as the text that the strings in `search_list`
-            are matched against.
+        query (str | NormalizedText): The string within which to search for matches; acts as the text that the strings
+            in `search_list` are matched against.
         search_list (list[str]): A list of strings to check against the `query`.
 
     Returns:
@@ -101,20 +667,23 @@ def get_matches(query: str, search_list: list[str]) -> list[str]:
         ['ab', 'de']    # "ab" is in "abc", "de" is in "def", "xyz" is not in either
     """
     matches: list[str] = []
+    seen: set[str] = set()
 
     # Preprocess query for case-insensitive comparison
+    normalized_query = normalize(query)
     for item in search_list:
-        if item not in matches and match(query, item):
+        if item not in seen and match(normalized_query, item):
+            seen.add(item)
             matches.append(item)
 
     return matches
 
 
 def get_matches_by_attr(
-    query: str,
+    query: str | NormalizedText,
     search_list: list[T],
     *,
-    key: Callable[[T], str | list[str]] = lambda _: str(_)
+    key: Callable[[T], str | list[str] | NormalizedText] = lambda _: str(_),
 ) -> list[T]:
     """
     Find objects in `search_list` where the fragments extracted by `key` (from a string or list) all match as substrings within the fragments of `query`, using case-insensitive matching.
@@ -127,9 +696,9 @@ def get_matches_by_attr(
     - Collect and return unique objects from `search_list` where this condition is satisfied.
 
     Args:
-        query (str): The string within which to search for matches.
+        query (str | NormalizedText): The string within which to search for matches.
         search_list (list[T]): A list of objects to check against the `query`.
-        key (Callable[[T], str | list[str]], optional): A function that takes an object and returns either a string or a list of strings representing the fragments to match against `query`. Defaults to converting the object to a string using `str()`.
+        key (Callable[[T], str | list[str] | NormalizedText], optional): A function that takes an object and returns either a string, a list of strings or a `NormalizedText` representing the fragments to match against `query`. Defaults to converting the object to a string using `str()`.
 
     Returns:
         list[T]: A list of unique objects from `search_list` where all extracted fragments match the `query`.
@@ -156,15 +725,16 @@ def get_matches_by_attr(
     matches: list[T] = []
 
     # Preprocess query for case-insensitive comparison
+    normalized_query = normalize(query)
     for item in search_list:
-        if item not in matches and match(query, key(item)):
+        if item not in matches and match(normalized_query, key(item)):
             matches.append(item)
 
     return matches
 
 
 def get_identifiable_matches(
-    query: str, search_dict: dict[str, T]
+    query: str | NormalizedText, search_dict: dict[str, T]
 ) -> list[dict[str, T]]:
     """
     Find entries in `search_dict` where either the key or the value (if it is a string) "matches" the `query` string,
@@ -182,7 +752,7 @@ def get_identifiable_matches(
     - Returns a list of unique `{key: value}` dictionaries for matching pairs.
 
     Args:
-        query (str): The string within which to search for matches.
+        query (str | NormalizedText): The string within which to search for matches.
         search_dict (dict[str, T]): A dictionary with string keys and values of type `T`, where keys and string values
             are matched against the `query`.
 
@@ -201,9 +771,11 @@ def get_identifiable_matches(
     matches: list[dict[str, T]] = []
 
     # Preprocess query for case-insensitive comparison
+    normalized_query = normalize(query)
     for key, value in search_dict.items():
         if value not in matches and (
-            match(query, key) or (isinstance(value, str) and match(query, value))
+            match(normalized_query, key)
+            or (isinstance(value, str) and match(normalized_query, value))
         ):
             matches.append({key: value})
 
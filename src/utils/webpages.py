@@ -0,0 +1,163 @@
+import re
+import codecs
+import asyncio
+from typing import Optional
+
+from .. import config
+from .logger import get_logger
+from .processes import ProcessPool
+
+from bs4 import BeautifulSoup
+from markdownify import MarkdownConverter
+
+__all__ = (
+    "sniff_charset",
+    "decode_html",
+    "html_to_markdown",
+    "shutdown_html_workers",
+)
+
+logger = get_logger(__name__)
+
+# Only the start of a document is searched for a <meta> charset, like browsers do
+META_SNIFF_BYTES = 2048
+
+META_CHARSET_RE = re.compile(
+    rb"""<meta[^>]+charset\s*=\s*["']?\s*([a-zA-Z0-9_\-:.]+)""", re.IGNORECASE
+)
+
+BOMS = (
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+
+# Elements that never contain content worth converting
+NOISE_TAGS = ("script", "style", "noscript", "template", "svg", "iframe")
+# Elements that usually only hold page chrome around the main content
+CHROME_TAGS = ("nav", "header", "footer", "aside", "form")
+
+
+def _known_charset(charset: str) -> Optional[str]:
+    try:
+        return codecs.lookup(charset.strip().strip("\"'")).name
+    except LookupError:
+        return None
+
+
+def sniff_charset(body: bytes, content_type: Optional[str] = None) -> Optional[str]:
+    """
+    Find the charset of an HTML document without running charset detection.
+
+    Checks the `Content-Type` header, then a byte order mark, then `<meta charset>` and
+    `<meta http-equiv="Content-Type">` tags at the start of the document.
+
+    Returns:
+        Optional[str]: The charset, or None if the document doesn't declare one.
+    """
+    for param in (content_type or "").split(";")[1:]:
+        name, _, value = param.strip().partition("=")
+        if name.lower() == "charset" and value:
+            charset = _known_charset(value)
+            if charset:
+                return charset
+
+    for bom, charset in BOMS:
+        if body.startswith(bom):
+            return charset
+
+    found = META_CHARSET_RE.search(body[:META_SNIFF_BYTES])
+    if found:
+        return _known_charset(found.group(1).decode("ascii", errors="ignore"))
+
+    return None
+
+
+def decode_html(body: bytes, content_type: Optional[str] = None) -> str:
+    """Decode an HTML document using its declared charset, falling back to UTF-8 and then Windows-1252."""
+    charset = sniff_charset(body, content_type)
+    if charset:
+        return body.decode(charset, errors="replace")
+
+    try:
+        return body.decode("utf-8")
+    except UnicodeDecodeError:
+        return body.decode("cp1252", errors="replace")
+
+
+def _convert(html: str, main_content: bool) -> str:
+    """Convert HTML to markdown. Runs in a worker process."""
+    soup = BeautifulSoup(html, "html.parser")
+
+    for tag in soup(NOISE_TAGS):
+        tag.decompose()
+
+    if main_content:
+        main = (
+            soup.find("main")
+            or soup.find(attrs={"role": "main"})
+            or soup.find("article")
+            or soup.body
+            or soup
+        )
+        for tag in main(CHROME_TAGS):
+            tag.decompose()
+        soup = main
+
+    return MarkdownConverter().convert_soup(soup)
+
+
+_pool = ProcessPool(config.HTML_CONVERSION_WORKERS, name="HTML conversion")
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+
+    if _semaphore is None:
+        # Callers past this point wait here instead of piling documents up in the pool's queue
+        _semaphore = asyncio.Semaphore(config.HTML_CONVERSION_WORKERS * 2)
+    return _semaphore
+
+
+async def html_to_markdown(
+    html: str,
+    *,
+    main_content: bool = False,
+    max_length: Optional[int] = config.HTML_CONVERSION_MAX_LENGTH,
+    timeout: Optional[float] = config.HTML_CONVERSION_TIMEOUT,
+) -> str:
+    """
+    Convert HTML to markdown in a worker process so big pages don't block the event loop.
+
+    `<script>`, `<style>` and similar elements are dropped before converting.
+
+    Args:
+        html (str): The HTML to convert.
+        main_content (bool): Only convert the main content of the page (`<main>`, `<article>` or `<body>`), without
+            navigation, headers, footers, sidebars and forms. Defaults to False.
+        max_length (Optional[int]): Documents longer than this many characters are cut off before converting. None
+            for no limit.
+        timeout (Optional[float]): Seconds to wait for the conversion. None to wait forever.
+
+    Raises:
+        asyncio.TimeoutError: The conversion took longer than `timeout`. A worker stuck on it is killed once the other
+            conversions in its pool had the same time to finish.
+
+    Returns:
+        str: The markdown.
+    """
+    if max_length is not None and len(html) > max_length:
+        logger.debug(f"cutting off HTML document of length {len(html)} at {max_length}")
+        html = html[:max_length]
+
+    async with _get_semaphore():
+        return await _pool.run(_convert, html, main_content, timeout=timeout)
+
+
+def shutdown_html_workers() -> None:
+    """Stop the HTML conversion worker processes. They are started again on the next conversion."""
+    global _semaphore
+
+    _pool.shutdown()
+    _semaphore = None
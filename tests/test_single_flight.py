@@ -0,0 +1,67 @@
+import asyncio
+
+from src.utils import SingleFlight
+
+
+async def _slow_call(calls: list[str], name: str, *, dying_time: float = 0) -> str:
+    calls.append(name)
+    try:
+        await asyncio.sleep(0.1)
+    except asyncio.CancelledError:
+        # Wind down slowly, like a download closing its connection
+        await asyncio.sleep(dying_time)
+        raise
+    return name
+
+
+def test_concurrent_calls_share_one_call() -> None:
+    async def main() -> None:
+        flights: SingleFlight[str] = SingleFlight()
+        calls: list[str] = []
+
+        results = await asyncio.gather(
+            *(flights.run("key", lambda: _slow_call(calls, "a")) for _ in range(20))
+        )
+
+        assert results == ["a"] * 20
+        assert calls == ["a"]
+        assert len(flights) == 0
+
+    asyncio.run(main())
+
+
+def test_cancelling_one_waiter_keeps_the_call_for_the_others() -> None:
+    async def main() -> None:
+        flights: SingleFlight[str] = SingleFlight()
+        calls: list[str] = []
+
+        first = asyncio.create_task(flights.run("key", lambda: _slow_call(calls, "a")))
+        second = asyncio.create_task(flights.run("key", lambda: _slow_call(calls, "b")))
+        await asyncio.sleep(0.01)
+        first.cancel()
+
+        assert await second == "a"
+        assert calls == ["a"]
+
+    asyncio.run(main())
+
+
+def test_caller_arriving_while_cancelled_call_winds_down_starts_a_new_call() -> None:
+    async def main() -> None:
+        flights: SingleFlight[str] = SingleFlight()
+        calls: list[str] = []
+
+        first = asyncio.create_task(
+            flights.run("key", lambda: _slow_call(calls, "a", dying_time=0.05))
+        )
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0)
+
+        late = asyncio.create_task(flights.run("key", lambda: _slow_call(calls, "d")))
+
+        assert await late == "d"
+        assert calls == ["a", "d"]
+        assert first.cancelled()
+
+    asyncio.run(main())